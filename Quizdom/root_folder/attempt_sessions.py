@@ -0,0 +1,252 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Server-side state of the quiz attempts in progress, keyed by (user_id, quiz_id): when the attempt started,
+# its deadline and the answers autosaved so far ({question_id: option}). Each attempt is timed on its own,
+# and nothing but the login stays in the cookie. An entry expires ttl seconds after its deadline, so
+# abandoned attempts clean themselves up.
+#   MemoryAttemptStore   one process; the default for the development server
+#   SQLiteAttemptStore   a local file shared by every worker process on the machine
+#   RedisAttemptStore    any redis-py compatible client, for workers on several machines
+
+
+def new_attempt(now, duration):
+    return {'started_at': now, 'deadline': now + duration, 'answers': {}}
+
+
+class MemoryAttemptStore:
+    def __init__(self, ttl=3600, sweep_interval=60, clock=time.time):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.next_sweep = clock() + sweep_interval
+
+    def live(self, key, now):
+        attempt = self.entries.get(key)
+        if attempt is not None and attempt['deadline'] + self.ttl < now:
+            del self.entries[key]
+            return None
+        return attempt
+
+    # Drop every expired entry, at most once per sweep_interval
+    def sweep(self, now):
+        if now < self.next_sweep:
+            return
+        self.next_sweep = now + self.sweep_interval
+        for key in [key for key, attempt in self.entries.items() if attempt['deadline'] + self.ttl < now]:
+            del self.entries[key]
+
+    # The attempt in progress, or a new one of duration seconds starting now
+    def start(self, user_id, quiz_id, duration):
+        now = self.clock()
+        with self.lock:
+            self.sweep(now)
+            attempt = self.live((user_id, quiz_id), now)
+            if attempt is None:
+                attempt = self.entries[(user_id, quiz_id)] = new_attempt(now, duration)
+            return dict(attempt, answers=dict(attempt['answers']))
+
+    def get(self, user_id, quiz_id):
+        with self.lock:
+            attempt = self.live((user_id, quiz_id), self.clock())
+            return None if attempt is None else dict(attempt, answers=dict(attempt['answers']))
+
+    # Merge answers into the attempt; returns it, or None when there is no attempt in progress
+    def save_answers(self, user_id, quiz_id, answers):
+        with self.lock:
+            attempt = self.live((user_id, quiz_id), self.clock())
+            if attempt is None:
+                return None
+            attempt['answers'].update(answers)
+            return dict(attempt, answers=dict(attempt['answers']))
+
+    # Remove the attempt once it is submitted; returns it, or None
+    def finish(self, user_id, quiz_id):
+        with self.lock:
+            attempt = self.live((user_id, quiz_id), self.clock())
+            self.entries.pop((user_id, quiz_id), None)
+            return attempt
+
+    def stats(self):
+        with self.lock:
+            return {'backend': 'memory', 'attempts': len(self.entries)}
+
+
+SQLITE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS attempt_session (user_id INTEGER NOT NULL, quiz_id INTEGER NOT NULL, "
+    "started_at REAL NOT NULL, deadline REAL NOT NULL, expires_at REAL NOT NULL, answers TEXT NOT NULL, "
+    "PRIMARY KEY (user_id, quiz_id))",
+    "CREATE INDEX IF NOT EXISTS ix_attempt_session_expires_at ON attempt_session (expires_at)"
+]
+
+
+def attempt_from_row(row):
+    started_at, deadline, answers = row
+    return {'started_at': started_at, 'deadline': deadline, 'answers': {int(key): value for key, value in json.loads(answers).items()}}
+
+
+class SQLiteAttemptStore:
+    def __init__(self, path, ttl=3600, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self.local = threading.local()
+
+    # One connection per thread, opened (and the table created) on first use
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Losing the last autosave in a power cut is acceptable; an fsync per answer is not
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SQLITE_SCHEMA:
+                connection.execute(statement)
+            self.local.connection = connection
+        return connection
+
+    def transaction(self, work):
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(connection)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    def select(self, connection, user_id, quiz_id, now):
+        row = connection.execute(
+            "SELECT started_at, deadline, answers FROM attempt_session WHERE user_id = ? AND quiz_id = ? AND expires_at >= ?",
+            (user_id, quiz_id, now)
+        ).fetchone()
+        return None if row is None else attempt_from_row(row)
+
+    def start(self, user_id, quiz_id, duration):
+        now = self.clock()
+
+        def work(connection):
+            attempt = self.select(connection, user_id, quiz_id, now)
+            if attempt is not None:
+                return attempt
+            # Expired entries are removed by whichever attempt starts next
+            connection.execute("DELETE FROM attempt_session WHERE expires_at < ?", (now,))
+            attempt = new_attempt(now, duration)
+            connection.execute(
+                "INSERT INTO attempt_session (user_id, quiz_id, started_at, deadline, expires_at, answers) VALUES (?, ?, ?, ?, ?, '{}')",
+                (user_id, quiz_id, attempt['started_at'], attempt['deadline'], attempt['deadline'] + self.ttl)
+            )
+            return attempt
+        return self.transaction(work)
+
+    def get(self, user_id, quiz_id):
+        return self.select(self.connection(), user_id, quiz_id, self.clock())
+
+    def save_answers(self, user_id, quiz_id, answers):
+        now = self.clock()
+
+        def work(connection):
+            attempt = self.select(connection, user_id, quiz_id, now)
+            if attempt is None:
+                return None
+            attempt['answers'].update(answers)
+            connection.execute("UPDATE attempt_session SET answers = ? WHERE user_id = ? AND quiz_id = ?",
+                               (json.dumps(attempt['answers']), user_id, quiz_id))
+            return attempt
+        return self.transaction(work)
+
+    def finish(self, user_id, quiz_id):
+        now = self.clock()
+
+        def work(connection):
+            attempt = self.select(connection, user_id, quiz_id, now)
+            connection.execute("DELETE FROM attempt_session WHERE user_id = ? AND quiz_id = ?", (user_id, quiz_id))
+            return attempt
+        return self.transaction(work)
+
+    def stats(self):
+        count = self.connection().execute("SELECT COUNT(*) FROM attempt_session WHERE expires_at >= ?", (self.clock(),)).fetchone()[0]
+        return {'backend': 'sqlite', 'attempts': count}
+
+
+# Two keys per attempt: the start and deadline, written once with SET NX, and a hash of the answers, so
+# concurrent autosaves of different questions never overwrite each other. Redis expires both keys.
+class RedisAttemptStore:
+    def __init__(self, client, ttl=3600, prefix='quizdom:attempt', clock=time.time):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.clock = clock
+
+    def keys(self, user_id, quiz_id):
+        key = f'{self.prefix}:{user_id}:{quiz_id}'
+        return key, key + ':answers'
+
+    def read(self, user_id, quiz_id):
+        timing_key, answers_key = self.keys(user_id, quiz_id)
+        pipeline = self.client.pipeline()
+        pipeline.get(timing_key)
+        pipeline.hgetall(answers_key)
+        timing, answers = pipeline.execute()
+        if timing is None:
+            return None
+        attempt = json.loads(timing)
+        attempt['answers'] = {int(key): int(value) for key, value in answers.items()}
+        return attempt
+
+    def start(self, user_id, quiz_id, duration):
+        attempt = new_attempt(self.clock(), duration)
+        timing_key, answers_key = self.keys(user_id, quiz_id)
+        expires_at = int(attempt['deadline'] + self.ttl) + 1
+        timing = json.dumps({'started_at': attempt['started_at'], 'deadline': attempt['deadline']})
+        if self.client.set(timing_key, timing, nx=True, exat=expires_at):
+            # Answers left over from an earlier attempt whose timing key already expired
+            self.client.delete(answers_key)
+            return attempt
+        return self.read(user_id, quiz_id) or attempt
+
+    def get(self, user_id, quiz_id):
+        return self.read(user_id, quiz_id)
+
+    def save_answers(self, user_id, quiz_id, answers):
+        attempt = self.read(user_id, quiz_id)
+        if attempt is None:
+            return None
+        if answers:
+            _, answers_key = self.keys(user_id, quiz_id)
+            pipeline = self.client.pipeline()
+            pipeline.hset(answers_key, mapping={str(key): value for key, value in answers.items()})
+            pipeline.expireat(answers_key, int(attempt['deadline'] + self.ttl) + 1)
+            pipeline.execute()
+            attempt['answers'].update(answers)
+        return attempt
+
+    def finish(self, user_id, quiz_id):
+        attempt = self.read(user_id, quiz_id)
+        self.client.delete(*self.keys(user_id, quiz_id))
+        return attempt
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+# ATTEMPT_STORE is 'memory', 'sqlite' (a file at path) or a redis:// URL
+def open_store(kind, path=None, ttl=3600):
+    if kind == 'memory':
+        return MemoryAttemptStore(ttl)
+    if kind == 'sqlite':
+        return SQLiteAttemptStore(path, ttl)
+    if kind.startswith(('redis://', 'rediss://', 'unix://')):
+        # Only needed for this backend: pip install redis
+        import redis
+        return RedisAttemptStore(redis.Redis.from_url(kind, decode_responses=True), ttl)
+    raise ValueError(f'Unknown attempt store: {kind}')
@@ -0,0 +1,78 @@
+# Measures how long `import main` takes and how much memory it costs in a fresh process, the price every
+# worker pays at startup, and checks that the plotting libraries are not part of it.
+# Usage (from the folder containing main.py): python benchmarks/import_time.py --repeat 5 --budget-ms 1000
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only needed by the summary charts; importing main must not load them
+LAZY_MODULES = ['matplotlib', 'seaborn', 'pandas']
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'ms': elapsed * 1000,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': sorted({name.split('.')[0] for name in sys.modules})
+}))
+"""
+
+
+def measure(environment, import_times=False):
+    command = [sys.executable] + (['-X', 'importtime'] if import_times else []) + ['-c', PROBE]
+    result = subprocess.run(command, cwd=ROOT, env=environment, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+# The modules main.py imports directly, by cumulative import time, from python -X importtime
+def slowest_imports(importtime_output, count):
+    modules = {}
+    for line in importtime_output.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)', line)
+        # Nested imports are indented two more spaces per level; main itself is at one space
+        if match and len(match.group(2)) == 3:
+            modules[match.group(3)] = int(match.group(1)) / 1000
+    return sorted(modules.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time and memory of main.py.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, help='exit with an error when the median import time is above this')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Importing must not need a database, so point it at one that does not exist yet
+        environment = dict(os.environ, QUIZDOM_DATABASE_URL=f"sqlite:///{os.path.join(folder, 'import.db')}")
+        runs = [measure(environment)[0] for _ in range(args.repeat)]
+        _, importtime_output = measure(environment, import_times=True)
+
+    median_ms = statistics.median(run['ms'] for run in runs)
+    print(f"import main: median {median_ms:.0f} ms over {args.repeat} runs, max RSS {max(run['max_rss_mb'] for run in runs):.0f} MB")
+    print("slowest imports of main.py:")
+    for module, ms in slowest_imports(importtime_output, args.top):
+        print(f"  {module}: {ms:.0f} ms")
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in runs[0]['loaded']]
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        failures.append(f"median {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# Login storm: many clients log in at once, as a class does at the start of an exam, while a few signed-in users
+# keep browsing. Compares hashing passwords on the request threads with the bounded process pool: logins per
+# second, login latency, "try again" (503) answers and the latency of the other pages during the storm.
+# Usage (from the folder containing main.py): python benchmarks/login_throughput.py --clients 32 --seconds 10
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'storm'
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def seed(main, args):
+    db = main.db
+    password_hash = main.password_hasher.hash(PASSWORD)
+    db.session.execute(db.insert(main.User), [{
+        'username': f'storm{number}', 'email': f'storm{number}@example.com', 'password_hash': password_hash,
+        'fullname': 'Login Storm', 'qualification': 'Load', 'dob': datetime(2000, 1, 1).date()
+    } for number in range(args.users)])
+    db.session.commit()
+    return password_hash
+
+
+def storm(main, args, hasher):
+    main.password_hasher = hasher
+    results = {'login': [], 'page': []}
+    answers = {'ok': 0, 'busy': 0, 'failed': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def login(number):
+        client = main.app.test_client()
+        count = 0
+        while time.perf_counter() < deadline:
+            username = f'storm{(number + count * args.clients) % args.users}'
+            started = time.perf_counter()
+            response = client.post('/User-Login', data={'username_or_email': username, 'password': PASSWORD})
+            elapsed = time.perf_counter() - started
+            outcome = 'ok' if response.status_code == 302 else 'busy' if response.status_code == 503 else 'failed'
+            with lock:
+                results['login'].append(elapsed)
+                answers[outcome] += 1
+            count += 1
+            # Like a browser told to try again, wait before the next attempt
+            if outcome == 'busy':
+                time.sleep(float(response.headers.get('Retry-After', 1)))
+
+    def browse(number):
+        client = main.app.test_client()
+        client.post('/User-Login', data={'username_or_email': f'storm{number}', 'password': PASSWORD})
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get('/User-Dashboard')
+            with lock:
+                results['page'].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=login, args=(number,)) for number in range(args.clients)]
+    threads += [threading.Thread(target=browse, args=(number,)) for number in range(args.browsers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+    return {
+        'logins_per_second': answers['ok'] / elapsed, 'answers': answers,
+        'login_p50_ms': percentile(results['login'], 0.5) * 1000, 'login_p99_ms': percentile(results['login'], 0.99) * 1000,
+        'pages': len(results['page']), 'page_p99_ms': percentile(results['page'], 0.99) * 1000, 'rehashed': hasher.stats()['rehashed']
+    }
+
+
+def run(args):
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    import main
+    from password_service import PasswordHasher
+    main.init_database()
+    password_hash = seed(main, args)
+    modes = [
+        ('request threads', PasswordHasher(args.method, 0, args.clients, args.timeout)),
+        (f'pool of {args.workers}', PasswordHasher(args.method, args.workers, args.queue, args.timeout))
+    ]
+    if args.legacy_method:
+        # Every user starts with an outdated hash, which the first login upgrades
+        password_hash = PasswordHasher(args.legacy_method, 0).hash(PASSWORD)
+    for name, hasher in modes:
+        main.db.session.execute(main.db.update(main.User).where(main.User.username.like('storm%')).values(password_hash=password_hash))
+        main.db.session.commit()
+        # Start the pool processes before the clock runs
+        hasher.hash(PASSWORD)
+        report = storm(main, args, hasher)
+        answers = report['answers']
+        print(f"{name}: {report['logins_per_second']:.1f} logins/s, {answers['ok']} ok, {answers['busy']} busy, "
+              f"{answers['failed']} failed, login p50 {report['login_p50_ms']:.0f} ms, p99 {report['login_p99_ms']:.0f} ms, "
+              f"{report['pages']} other pages (p99 {report['page_p99_ms']:.1f} ms), {report['rehashed']} hashes upgraded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput under concurrency, hashing inline vs in a process pool.')
+    parser.add_argument('--clients', type=int, default=32, help='threads logging in back to back')
+    parser.add_argument('--browsers', type=int, default=2, help='signed-in threads loading the dashboard meanwhile')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='PASSWORD_HASH_METHOD')
+    parser.add_argument('--legacy-method', default='', help='seed the users with hashes of this method, e.g. pbkdf2:sha256:600000')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help='PASSWORD_HASH_WORKERS')
+    parser.add_argument('--queue', type=int, default=16, help='PASSWORD_HASH_QUEUE')
+    parser.add_argument('--timeout', type=float, default=5, help='PASSWORD_HASH_TIMEOUT')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        # main binds to its database when it is imported
+        os.environ['QUIZDOM_DATABASE_URL'] = f"sqlite:///{os.path.join(folder, 'logins.db')}"
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
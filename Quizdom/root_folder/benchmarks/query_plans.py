@@ -0,0 +1,126 @@
+# Shows the SQLite query plans and timings of the hot lookups before and after the schema migrations.
+# Usage (from the folder containing main.py): python benchmarks/query_plans.py --scores 200000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import migrations
+
+# The tables as the first release created them, without any of the later indexes
+BASELINE_SCHEMA = [
+    "CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(50) NOT NULL UNIQUE, email VARCHAR(100) NOT NULL UNIQUE, "
+    "password_hash VARCHAR(200) NOT NULL, fullname VARCHAR(100) NOT NULL, qualification VARCHAR(100) NOT NULL, "
+    "dob DATE NOT NULL, created_at DATETIME, is_active BOOLEAN)",
+    "CREATE TABLE subject (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, description TEXT NOT NULL)",
+    "CREATE TABLE chapter (id INTEGER PRIMARY KEY, title VARCHAR(100) NOT NULL, description TEXT NOT NULL, "
+    "subject_id INTEGER NOT NULL REFERENCES subject (id))",
+    "CREATE TABLE quiz (id INTEGER PRIMARY KEY, title VARCHAR(100) NOT NULL, chapter_id INTEGER NOT NULL REFERENCES chapter (id), "
+    "date_of_quiz DATETIME, time_duration INTEGER NOT NULL, remarks TEXT NOT NULL)",
+    "CREATE TABLE question (id INTEGER PRIMARY KEY, quiz_id INTEGER NOT NULL REFERENCES quiz (id), question_text TEXT NOT NULL, "
+    "option1 VARCHAR(100) NOT NULL, option2 VARCHAR(100) NOT NULL, option3 VARCHAR(100) NOT NULL, "
+    "option4 VARCHAR(100) NOT NULL, correct_option INTEGER NOT NULL)",
+    "CREATE TABLE score (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (id), "
+    "quiz_id INTEGER NOT NULL REFERENCES quiz (id), score INTEGER NOT NULL, date_taken DATETIME, "
+    "time_taken INTEGER NOT NULL, completed BOOLEAN)",
+    "CREATE TABLE subject_stats (subject_id INTEGER PRIMARY KEY, attempts INTEGER NOT NULL, max_score INTEGER NOT NULL, "
+    "max_percentage FLOAT NOT NULL, total_time INTEGER NOT NULL)",
+    "CREATE TABLE user_subject_stats (user_id INTEGER, subject_id INTEGER, attempts INTEGER NOT NULL, max_score INTEGER NOT NULL, "
+    "max_percentage FLOAT NOT NULL, total_time INTEGER NOT NULL, PRIMARY KEY (user_id, subject_id))"
+]
+
+QUERIES = {
+    'duplicate attempt check': "SELECT id FROM score WHERE user_id = :user_id AND quiz_id = :quiz_id LIMIT 1",
+    'scorecard page': "SELECT score.id, subject.name, chapter.title, score.score FROM score "
+                      "JOIN quiz ON score.quiz_id = quiz.id JOIN chapter ON quiz.chapter_id = chapter.id "
+                      "JOIN subject ON chapter.subject_id = subject.id WHERE score.user_id = :user_id ORDER BY score.id LIMIT 21",
+    'questions of a quiz': "SELECT id, correct_option FROM question WHERE quiz_id = :quiz_id",
+    'attempts of a quiz': "SELECT COUNT(*) FROM score WHERE quiz_id = :quiz_id",
+    'quizzes of a subject': "SELECT quiz.id FROM quiz JOIN chapter ON quiz.chapter_id = chapter.id WHERE chapter.subject_id = :subject_id",
+    'quizzes by date': "SELECT id FROM quiz WHERE date_of_quiz >= :day ORDER BY date_of_quiz LIMIT 20"
+}
+
+
+def seed(connection, args):
+    random.seed(42)
+    connection.execute(text("INSERT INTO subject (id, name, description) VALUES (:id, :name, 'd')"),
+                       [{'id': i, 'name': f'Subject {i}'} for i in range(1, args.subjects + 1)])
+    chapters = args.subjects * args.chapters
+    connection.execute(text("INSERT INTO chapter (id, title, description, subject_id) VALUES (:id, :title, 'd', :subject_id)"),
+                       [{'id': i, 'title': f'Chapter {i}', 'subject_id': (i - 1) // args.chapters + 1} for i in range(1, chapters + 1)])
+    connection.execute(text("INSERT INTO quiz (id, title, chapter_id, date_of_quiz, time_duration, remarks) "
+                            "VALUES (:id, :title, :chapter_id, :day, 30, 'r')"),
+                       [{'id': i, 'title': f'Quiz {i}', 'chapter_id': random.randint(1, chapters),
+                         'day': f'2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d} 00:00:00'} for i in range(1, args.quizzes + 1)])
+    connection.execute(text("INSERT INTO question (quiz_id, question_text, option1, option2, option3, option4, correct_option) "
+                            "VALUES (:quiz_id, 'q', 'a', 'b', 'c', 'd', :correct)"),
+                       [{'quiz_id': quiz_id, 'correct': random.randint(1, 4)}
+                        for quiz_id in range(1, args.quizzes + 1) for _ in range(args.questions)])
+    connection.execute(text("INSERT INTO user (id, username, email, password_hash, fullname, qualification, dob, is_active) "
+                            "VALUES (:id, :name, :email, 'x', 'n', 'q', '2000-01-01', 1)"),
+                       [{'id': i, 'name': f'user{i}', 'email': f'user{i}@example.com'} for i in range(1, args.users + 1)])
+    # Scores are unique per (user, quiz) so the unique index can be created
+    pairs = set()
+    while len(pairs) < min(args.scores, args.users * args.quizzes):
+        pairs.add((random.randint(1, args.users), random.randint(1, args.quizzes)))
+    connection.execute(text("INSERT INTO score (user_id, quiz_id, score, date_taken, time_taken, completed) "
+                            "VALUES (:user_id, :quiz_id, :score, '2025-01-01 00:00:00', 60, 1)"),
+                       [{'user_id': user_id, 'quiz_id': quiz_id, 'score': random.randint(0, args.questions)} for user_id, quiz_id in pairs])
+
+
+def measure(connection, args):
+    results = {}
+    for name, sql in QUERIES.items():
+        plan = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), parameters(args))]
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            connection.execute(text(sql), parameters(args)).all()
+        results[name] = (plan, (time.perf_counter() - started) / args.repeat * 1000)
+    return results
+
+
+def parameters(args):
+    return {'user_id': random.randint(1, args.users), 'quiz_id': random.randint(1, args.quizzes),
+            'subject_id': random.randint(1, args.subjects), 'day': '2025-06-01 00:00:00'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare query plans and timings before and after the schema migrations.')
+    parser.add_argument('--subjects', type=int, default=20)
+    parser.add_argument('--chapters', type=int, default=10, help='chapters per subject')
+    parser.add_argument('--quizzes', type=int, default=2000)
+    parser.add_argument('--questions', type=int, default=10, help='questions per quiz')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--scores', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = create_engine(f"sqlite:///{os.path.join(folder, 'benchmark.db')}")
+        with engine.begin() as connection:
+            for statement in BASELINE_SCHEMA:
+                connection.execute(text(statement))
+            seed(connection, args)
+        with engine.begin() as connection:
+            before = measure(connection, args)
+        with engine.begin() as connection:
+            applied = migrations.upgrade(connection)
+            connection.execute(text("ANALYZE"))
+        with engine.begin() as connection:
+            after = measure(connection, args)
+        engine.dispose()
+
+    print(f"Migrations applied: {', '.join(applied)}\n")
+    for name in QUERIES:
+        (plan_before, ms_before), (plan_after, ms_after) = before[name], after[name]
+        print(f"{name}: {ms_before:.3f} ms -> {ms_after:.3f} ms")
+        print(f"  before: {' | '.join(plan_before)}")
+        print(f"  after:  {' | '.join(plan_after)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Measures bulk question import and export throughput against adding questions one at a time.
+# Usage (from the folder containing main.py): python benchmarks/question_import.py --questions 50000
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import migrations
+import question_io
+import search_index
+from query_plans import BASELINE_SCHEMA
+
+
+def create_database(folder, name):
+    engine = create_engine(f"sqlite:///{os.path.join(folder, name)}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        migrations.upgrade(connection)
+    with Session(engine) as session:
+        # Imports pay for keeping the search index in sync, as they do in the app
+        search_index.create_search_index(session)
+        session.commit()
+    return engine
+
+
+def sample_rows(args):
+    random.seed(42)
+    for number in range(args.questions):
+        quiz = number % args.quizzes
+        yield {
+            'subject': f'Subject {quiz % args.subjects}', 'chapter': f'Chapter {quiz % (args.subjects * 5)}',
+            'quiz': f'Quiz {quiz}', 'question_text': f'What is {number} plus {number + 1}?',
+            'option1': str(2 * number), 'option2': str(2 * number + 1), 'option3': str(2 * number + 2),
+            'option4': str(number), 'correct_option': random.randint(1, 4)
+        }
+
+
+def write_sample(path, file_format, args):
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        if file_format == 'csv':
+            writer = csv.DictWriter(output, fieldnames=question_io.COLUMNS)
+            writer.writeheader()
+            writer.writerows(sample_rows(args))
+        else:
+            for row in sample_rows(args):
+                output.write(json.dumps(row) + '\n')
+
+
+# What adding questions through /New-Question costs: one insert and one commit per question
+def one_at_a_time(engine, args):
+    rows = list(sample_rows(args))[:args.single]
+    with Session(engine) as session:
+        lookup = question_io.ParentLookup(session, True, question_io.ImportResult())
+        started = time.perf_counter()
+        for number, raw_row in enumerate(rows, 1):
+            row = question_io.validate_row(number, raw_row)
+            quiz_id = lookup.quiz_id(number, row)
+            session.execute(question_io.INSERT_QUESTION, {
+                'quiz_id': quiz_id, 'question_text': row['question_text'], 'option1': row['option1'], 'option2': row['option2'],
+                'option3': row['option3'], 'option4': row['option4'], 'correct_option': row['correct_option']
+            })
+            session.execute(question_io.UPDATE_QUIZ, {'id': quiz_id, 'added': 1})
+            session.commit()
+        return len(rows), time.perf_counter() - started
+
+
+def bulk_import(engine, path, file_format, args):
+    with Session(engine) as session, open(path, encoding='utf-8', newline='') as stream:
+        started = time.perf_counter()
+        result = question_io.import_questions(session, question_io.iter_rows(stream, file_format), args.batch_size)
+        return result.imported, time.perf_counter() - started
+
+
+def export(engine, file_format, args):
+    with Session(engine) as session:
+        started = time.perf_counter()
+        size = sum(len(chunk) for chunk in question_io.export_questions(session, file_format, args.batch_size))
+        return size, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare bulk question import/export throughput with single inserts.')
+    parser.add_argument('--questions', type=int, default=50000)
+    parser.add_argument('--quizzes', type=int, default=500)
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--single', type=int, default=2000, help='questions added one at a time (extrapolated)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        count, seconds = one_at_a_time(create_database(folder, 'single.db'), args)
+        print(f"one at a time: {count} questions in {seconds:.2f} s ({count / seconds:,.0f} rows/s)")
+        for file_format in ('csv', 'json'):
+            path = os.path.join(folder, f'questions.{file_format}')
+            write_sample(path, file_format, args)
+            engine = create_database(folder, f'bulk_{file_format}.db')
+            count, seconds = bulk_import(engine, path, file_format, args)
+            print(f"bulk {file_format} import: {count} questions in {seconds:.2f} s ({count / seconds:,.0f} rows/s)")
+            size, seconds = export(engine, file_format, args)
+            print(f"{file_format} export: {size / 1024 / 1024:.1f} MB in {seconds:.2f} s ({count / seconds:,.0f} rows/s)")
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# Benchmarks every page through the Flask test client against a synthetic dataset in a temporary database:
+# p50/p99 latency, SQL statements and bytes sent per request, compared with a stored baseline so regressions fail the run.
+# Usage (from the folder containing main.py): python benchmarks/routes.py --users 500 --scores 20000 --requests 50
+#        python benchmarks/routes.py --save-baseline    # after an intended change, record the new numbers
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Pages are requested the way a browser asks for them, so compression is part of the measured time
+BROWSER_HEADERS = {'Accept-Encoding': 'gzip, deflate, br'}
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+SCALE = ['subjects', 'chapters', 'quizzes', 'questions', 'users', 'scores']
+PASSWORD = 'bench'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def seed(main, args):
+    db = main.db
+    random.seed(42)
+    db.session.execute(db.insert(main.Subject), [
+        {'name': f'Subject {number}', 'description': 'Benchmark subject'} for number in range(args.subjects)
+    ])
+    subject_ids = db.session.scalars(db.select(main.Subject.id)).all()
+    db.session.execute(db.insert(main.Chapter), [
+        {'title': f'Chapter {subject_id}.{number}', 'description': 'Benchmark chapter', 'subject_id': subject_id}
+        for subject_id in subject_ids for number in range(args.chapters)
+    ])
+    chapter_ids = db.session.scalars(db.select(main.Chapter.id)).all()
+    db.session.execute(db.insert(main.Quiz), [
+        {'title': f'Quiz {chapter_id}.{number}', 'chapter_id': chapter_id, 'date_of_quiz': datetime(2025, 1, 1 + number % 28),
+         'time_duration': 30, 'remarks': '', 'question_count': args.questions}
+        for chapter_id in chapter_ids for number in range(args.quizzes)
+    ])
+    quiz_ids = db.session.scalars(db.select(main.Quiz.id)).all()
+    db.session.execute(db.insert(main.Question), [
+        {'quiz_id': quiz_id, 'question_text': f'Question {number} of quiz {quiz_id}', 'option1': 'a', 'option2': 'b',
+         'option3': 'c', 'option4': 'd', 'correct_option': number % 4 + 1}
+        for quiz_id in quiz_ids for number in range(args.questions)
+    ])
+    # Hashing once is enough; every user gets the same password
+    password_hash = main.password_hasher.hash(PASSWORD)
+    db.session.execute(db.insert(main.User), [
+        {'username': f'bench{number}', 'email': f'bench{number}@example.com', 'password_hash': password_hash,
+         'fullname': 'Bench User', 'qualification': 'Benchmark', 'dob': datetime(2000, 1, 1).date()}
+        for number in range(args.users)
+    ])
+    user_ids = db.session.scalars(db.select(main.User.id).where(main.User.username.like('bench%'))).all()
+    pairs = set()
+    while len(pairs) < min(args.scores, len(user_ids) * len(quiz_ids) // 2):
+        pairs.add((random.choice(user_ids), random.choice(quiz_ids)))
+    db.session.execute(db.insert(main.Score), [
+        {'user_id': user_id, 'quiz_id': quiz_id, 'score': random.randint(0, args.questions), 'date_taken': datetime(2025, 2, 1),
+         'time_taken': random.randint(10, 600), 'completed': True}
+        for user_id, quiz_id in sorted(pairs)
+    ])
+    main.rebuild_rollups()
+    db.session.commit()
+    return user_ids, quiz_ids, pairs
+
+
+class Runner:
+    def __init__(self, main):
+        self.main = main
+        self.statements = 0
+        self.results = {}
+
+        @event.listens_for(main.db.engine, 'before_cursor_execute')
+        def count_statement(*arguments):
+            self.statements += 1
+
+    # Time one request and count the statements it ran and the bytes it sent
+    def measure(self, name, send):
+        self.statements = 0
+        started = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: HTTP {response.status_code}')
+        result = self.results.setdefault(name, {'seconds': [], 'statements': [], 'bytes': []})
+        result['seconds'].append(elapsed)
+        result['statements'].append(self.statements)
+        result['bytes'].append(len(response.get_data()))
+        return response
+
+    def report(self):
+        return {name: {
+            'requests': len(result['seconds']),
+            'p50_ms': round(percentile(result['seconds'], 0.5) * 1000, 2),
+            'p99_ms': round(percentile(result['seconds'], 0.99) * 1000, 2),
+            'queries': statistics.median(result['statements']),
+            'max_queries': max(result['statements']),
+            'kb': round(statistics.median(result['bytes']) / 1024, 1)
+        } for name, result in self.results.items()}
+
+
+def login(main, path, username):
+    client = main.app.test_client()
+    response = client.post(path, data={'username_or_email': username, 'password': PASSWORD if username != 'admin' else 'admin123'})
+    if response.status_code != 302:
+        raise RuntimeError(f'could not log in as {username}')
+    return client
+
+
+def run(args):
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    import main
+    main.init_database()
+    user_ids, quiz_ids, attempted = seed(main, args)
+    # As a worker would at startup
+    main.warm_leaderboards()
+    runner = Runner(main)
+    admin = login(main, '/Admin-Login', 'admin')
+    # A handful of signed-in users; their attempts cycle through the quizzes they have not taken yet
+    clients = [(user_id, login(main, '/User-Login', f'bench{number}')) for number, user_id in enumerate(user_ids[:8])]
+    untaken = {user_id: [quiz_id for quiz_id in quiz_ids if (user_id, quiz_id) not in attempted] for user_id, _ in clients}
+
+    pages = [
+        ('upcomming_quizzes', None, '/Upcomming-Quizzes'),
+        ('upcomming_quizzes search', None, '/Upcomming-Quizzes?search=Quiz'),
+        ('scorecard', None, '/Scorecard'),
+        ('scorecard search', None, '/Scorecard?search=Subject'),
+        ('scorecard history', None, '/Scorecard?history=all'),
+        ('user_dashboard', None, '/User-Dashboard'),
+        ('user_summary', None, '/User-Summary'),
+        ('user_summary_data', None, '/User-Summary/Data'),
+        ('leaderboard', None, '/Leaderboard'),
+        ('leaderboard subject', None, '/Leaderboard/Subject/1'),
+        ('leaderboard quiz', None, '/Leaderboard/Quiz/1'),
+        ('admin_dashboard', admin, '/Admin-Dashboard'),
+        ('admin_summary', admin, '/Admin-Summary'),
+        ('admin_summary_data', admin, '/Admin-Summary/Data'),
+        ('manage_subjects', admin, '/Manage-Subjects'),
+        ('manage_subjects search', admin, '/Manage-Subjects?search=Subject'),
+        ('manage_quizzes', admin, '/Manage-Quizzes'),
+        ('manage_quizzes search', admin, '/Manage-Quizzes?search=Quiz'),
+        ('manage_users', admin, '/Manage-Users'),
+        ('manage_users search', admin, '/Manage-Users?search=bench')
+    ]
+    question_ids = {}
+    for quiz_id, question_id in main.db.session.execute(main.db.select(main.Question.quiz_id, main.Question.id)):
+        question_ids.setdefault(quiz_id, []).append(question_id)
+
+    for iteration in range(args.requests + 1):
+        # The first round only warms up templates, caches and connections
+        if iteration == 1:
+            runner.results.clear()
+        user_id, client = clients[iteration % len(clients)]
+        runner.measure('user_login', lambda: main.app.test_client().post(
+            '/User-Login', data={'username_or_email': f'bench{iteration % len(user_ids)}', 'password': PASSWORD}))
+        for name, page_client, path in pages:
+            runner.measure(name, lambda: (page_client or client).get(path, headers=BROWSER_HEADERS))
+        if untaken[user_id]:
+            attempt = untaken[user_id].pop(0)
+            runner.measure('attempt_quiz GET', lambda: client.get(f'/Attempt-Quiz/{attempt}', headers=BROWSER_HEADERS))
+            answers = {f'question-{question_id}': '1' for question_id in question_ids[attempt]}
+            runner.measure('attempt_quiz POST', lambda: client.post(f'/Attempt-Quiz/{attempt}', data=answers))
+    return runner.report()
+
+
+# Statement counts must not grow at all; latency may drift by the tolerance plus a little noise on fast pages
+def compare(report, baseline, tolerance, slack_ms):
+    regressions = []
+    for name, stats in sorted(report.items()):
+        before = baseline['routes'].get(name)
+        if before is None:
+            continue
+        if stats['queries'] > before['queries']:
+            regressions.append(f"{name}: {stats['queries']:g} queries per request, baseline {before['queries']:g}")
+        if baseline['latency_comparable'] and stats['p99_ms'] > before['p99_ms'] * tolerance + slack_ms:
+            regressions.append(f"{name}: p99 {stats['p99_ms']:.1f} ms, baseline {before['p99_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every Quizdom route against a synthetic dataset.')
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--chapters', type=int, default=5, help='chapters per subject')
+    parser.add_argument('--quizzes', type=int, default=4, help='quizzes per chapter')
+    parser.add_argument('--questions', type=int, default=10, help='questions per quiz')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--scores', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=50, help='requests per route')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='allowed p99 slowdown factor')
+    parser.add_argument('--slack-ms', type=float, default=5, help='allowed p99 slowdown in milliseconds on top of the factor')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        # main binds to its database when it is imported
+        os.environ['QUIZDOM_DATABASE_URL'] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+        report = run(args)
+
+    print(f"{'route':<28}{'p50 ms':>10}{'p99 ms':>10}{'queries':>10}{'kB':>10}")
+    for name, stats in report.items():
+        print(f"{name:<28}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['queries']:>10g}{stats['kb']:>10.1f}")
+
+    scale = {name: getattr(args, name) for name in SCALE}
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({'scale': scale, 'routes': report}, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print(f"Baseline saved to {args.baseline}.")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    # Latencies only compare at the same scale; statement counts should not depend on it
+    baseline['latency_comparable'] = baseline['scale'] == scale
+    if not baseline['latency_comparable']:
+        print("The baseline was recorded at a different scale; comparing query counts only.")
+    regressions = compare(report, baseline, args.tolerance, args.slack_ms)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if not regressions:
+        print("No regressions against the baseline.")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+import io
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+import seaborn as sns
+
+# Only imported inside the chart rendering processes (see chart_service.py); the plotting libraries add
+# hundreds of milliseconds and tens of MB to a process and request workers never need them.
+# Every render draws on its own Figure instead of pyplot's global state, so renders can run side by side.
+
+
+def render_chart(spec):
+    figure = Figure(figsize=(8, 6), facecolor=spec['facecolor'])
+    axes = figure.subplots()
+    if spec['kind'] == 'bar':
+        sns.barplot(x=spec['labels'], y=spec['values'], ax=axes)
+        axes.set_xlabel(spec['xlabel'])
+        axes.set_ylabel(spec['ylabel'])
+    else:
+        # Matplotlib refuses to draw a pie with no attempts yet, so leave the axes empty
+        if sum(spec['values']) > 0:
+            axes.pie(spec['values'], labels=spec['labels'], autopct='%1.1f%%')
+        axes.axis('equal')
+    axes.set_title(spec['title'])
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from charts import chart_key
+from process_pool import BoundedPool
+
+
+class ChartTimeout(Exception):
+    pass
+
+
+# Runs in a pool process; chart_rendering (and with it matplotlib) is only ever imported there
+def render(spec):
+    from chart_rendering import render_chart
+    return render_chart(spec)
+
+
+# Renders charts in a pool of processes so drawing uses every core and never holds a request worker's GIL.
+# The summary routes only submit a job and return; the chart image route waits for it, up to the timeout.
+# At most max_pending charts are queued or rendering at once; beyond that a request is refused rather than
+# queued, so a burst of summary views cannot pile up work. Identical charts in flight share one job.
+class ChartRenderer:
+    def __init__(self, cache, workers=2, max_pending=16, timeout=10):
+        self.cache = cache
+        # 0 workers renders in the calling thread, for development and tests
+        self.pool = BoundedPool(workers, max_pending)
+        self.timeout = timeout
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.counters = {'submitted': 0, 'rendered': 0, 'rejected': 0, 'timeouts': 0, 'failures': 0}
+        # Called with the chart kind and the seconds from submitting to the finished PNG, e.g. to record metrics
+        self.observer = None
+
+    # Start rendering the chart unless it is cached or already being rendered. Returns its key,
+    # or None when the render queue is full.
+    def request(self, spec):
+        key = chart_key(spec)
+        with self.lock:
+            if key in self.jobs or self.cache.get(key) is not None:
+                return key
+            started = time.perf_counter()
+            future = self.pool.submit(render, spec)
+            if future is None:
+                self.counters['rejected'] += 1
+                return None
+            self.counters['submitted'] += 1
+            self.jobs[key] = future
+        future.add_done_callback(lambda done: self.finish(key, done, spec.get('kind'), started))
+        return key
+
+    def finish(self, key, future, kind=None, started=None):
+        rendered = not future.cancelled() and future.exception() is None
+        with self.lock:
+            self.jobs.pop(key, None)
+            if rendered:
+                self.cache.put(key, future.result())
+                self.counters['rendered'] += 1
+            else:
+                self.counters['failures'] += 1
+        if rendered and self.observer is not None and started is not None:
+            self.observer(kind, time.perf_counter() - started)
+
+    # The PNG for a key, waiting for its render if one is running; None when the key is unknown or the render failed
+    def wait(self, key):
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+        with self.lock:
+            future = self.jobs.get(key)
+        if future is None:
+            return self.cache.get(key)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self.lock:
+                self.counters['timeouts'] += 1
+            raise ChartTimeout(key)
+        except Exception:
+            return None
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, pending=len(self.jobs))
+
+    def shutdown(self):
+        self.pool.shutdown()
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+# LRU cache of rendered PNGs, bounded by entry count and total bytes
+class ChartCache:
+    def __init__(self, max_entries=128, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            png = self.entries.get(key)
+            if png is not None:
+                self.entries.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= len(self.entries.pop(key))
+            self.entries[key] = png
+            self.total_bytes += len(png)
+            # Evict least recently used charts until both limits hold
+            while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+
+# The key is a hash of everything that affects the image, so identical data maps to one render
+def chart_key(spec):
+    payload = json.dumps(spec, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+# When the summary data of each scope (a user, or the whole site) last changed, for the Last-Modified header.
+# A scope's time moves on whenever its ETag differs from the one seen before; the ETag stays authoritative,
+# since clients that send If-None-Match are answered from it alone.
+class DataVersions:
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def changed_at(self, scope, etag):
+        with self.lock:
+            entry = self.entries.get(scope)
+            if entry is None or entry[0] != etag:
+                # HTTP dates have whole seconds
+                entry = (etag, datetime.now(timezone.utc).replace(microsecond=0))
+                self.entries[scope] = entry
+            self.entries.move_to_end(scope)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return entry[1]
@@ -0,0 +1,59 @@
+import gzip
+import hashlib
+from flask import request
+
+try:
+    # Optional: pip install brotli. Without it, responses are only gzipped
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compresses text responses (pages, JSON, metrics) for clients that accept it, and gives pages without an ETag
+# one from their content, so a repeat view of an unchanged page is answered with 304 Not Modified.
+# Streamed responses and files (chart PNGs, question exports) are left alone.
+COMPRESSIBLE = {'text/html', 'text/plain', 'text/css', 'text/csv', 'application/json', 'application/javascript'}
+
+
+# 'br' or 'gzip', whichever the client accepts with the higher quality; None when it accepts neither
+def choose_encoding(accept_encodings):
+    choices = [(accept_encodings.quality('gzip'), 'gzip')]
+    if brotli is not None:
+        # Preferred on a tie: smaller output at a similar cost
+        choices.append((accept_encodings.quality('br') + 0.0001, 'br'))
+    quality, encoding = max(choices)
+    return encoding if quality >= 0.001 else None
+
+
+def compress_body(body, encoding, gzip_level, brotli_quality):
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    # mtime=0 keeps the output the same for the same page
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def compress_responses(app, min_size=500, gzip_level=6, brotli_quality=5):
+    @app.after_request
+    def compress(response):
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+            return response
+        if response.mimetype not in COMPRESSIBLE or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        etag, _ = response.get_etag()
+        if etag is None:
+            etag = hashlib.sha256(body).hexdigest()[:32]
+            response.set_etag(etag)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+        if len(body) < min_size:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        response.set_data(compress_body(body, encoding, gzip_level, brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the page's; a weak ETag still matches it in If-None-Match
+        response.set_etag(etag, weak=True)
+        return response
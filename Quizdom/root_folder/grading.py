@@ -0,0 +1,60 @@
+import numpy as np
+
+# A stored attempt is a packed array of (question id, chosen option) records, 5 bytes per question;
+# option 0 means the question was left unanswered
+ANSWER_DTYPE = np.dtype([('question_id', '<u4'), ('option', 'u1')])
+
+
+# A quiz's answer key as two parallel arrays sorted by question id
+class AnswerKey:
+    def __init__(self, question_ids, correct_options):
+        question_ids = np.asarray(question_ids, dtype=np.uint32)
+        order = np.argsort(question_ids, kind='stable')
+        self.question_ids = question_ids[order]
+        self.correct_options = np.asarray(correct_options, dtype=np.uint8)[order]
+
+    def __len__(self):
+        return len(self.question_ids)
+
+
+def parse_option(value):
+    value = (value or '').strip()
+    # isdigit() alone also accepts digits such as '²', which int() rejects
+    return int(value) if value.isascii() and value.isdigit() and int(value) < 256 else 0
+
+
+# Collect the submitted options of a quiz form in answer key order
+def read_answers(key, form):
+    answers = np.empty(len(key), dtype=ANSWER_DTYPE)
+    answers['question_id'] = key.question_ids
+    answers['option'] = np.fromiter(
+        (parse_option(form.get(f'question-{question_id}')) for question_id in key.question_ids),
+        dtype=np.uint8, count=len(key)
+    )
+    return answers
+
+
+# A live submission is already aligned with the key, so grading is one array comparison
+def grade(key, answers):
+    return int(np.count_nonzero(answers['option'] == key.correct_options))
+
+
+def pack_answers(answers):
+    return answers.tobytes()
+
+
+def unpack_answers(data):
+    return np.frombuffer(data, dtype=ANSWER_DTYPE)
+
+
+# Grade many stored attempts against a (possibly edited) key at once. Attempts may predate added or
+# deleted questions, so answers are matched to the key by question id rather than by position.
+def grade_batch(key, answer_sets):
+    if not answer_sets or len(key) == 0:
+        return np.zeros(len(answer_sets), dtype=np.int64)
+    answers = np.concatenate(answer_sets)
+    owners = np.repeat(np.arange(len(answer_sets)), [len(answer_set) for answer_set in answer_sets])
+    positions = np.minimum(np.searchsorted(key.question_ids, answers['question_id']), len(key) - 1)
+    known = key.question_ids[positions] == answers['question_id']
+    correct = known & (key.correct_options[positions] == answers['option'])
+    return np.bincount(owners, weights=correct, minlength=len(answer_sets)).astype(np.int64)
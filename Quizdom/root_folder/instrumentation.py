@@ -0,0 +1,196 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Opt-in request profiling: per-endpoint latency, SQL statement counts and durations, template and chart
+# render times, kept in memory and exported in the Prometheus text format. Nothing here is hooked into the
+# app or the engine unless instrument_app/instrument_engine are called, so a disabled app pays nothing.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Label for statements run outside a request, e.g. by the score queue or a CLI command
+NO_ENDPOINT = 'none'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labels, labels)} {format_number(value)}"
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # Per label set: a count for each bucket (not cumulative), the sum and the number of observations
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self.lock:
+            values = {labels: (list(entry[0]), entry[1], entry[2]) for labels, entry in self.values.items()}
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{format_number(bound)}"'
+                yield f"{self.name}_bucket{format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, labels)} {format_number(total)}"
+            yield f"{self.name}_count{format_labels(self.labels, labels)} {count}"
+
+
+class Metrics:
+    def __init__(self, prefix='quizdom'):
+        self.prefix = prefix
+        self.request_seconds = Histogram(f'{prefix}_http_request_duration_seconds', 'Time to handle a request.',
+                                         ('endpoint', 'method', 'status'))
+        self.sql_statements = Counter(f'{prefix}_sql_statements_total', 'SQL statements executed.', ('endpoint', 'operation'))
+        self.sql_seconds = Histogram(f'{prefix}_sql_duration_seconds', 'Time spent executing SQL statements.',
+                                     ('endpoint', 'operation'), SQL_BUCKETS)
+        self.request_statements = Histogram(f'{prefix}_sql_statements_per_request', 'SQL statements executed by one request.',
+                                            ('endpoint',), COUNT_BUCKETS)
+        self.template_seconds = Histogram(f'{prefix}_template_render_seconds', 'Time to render a template.', ('template',))
+        self.chart_seconds = Histogram(f'{prefix}_chart_render_seconds', 'Time from submitting a chart to its PNG, including queueing.',
+                                       ('kind',))
+        self.metrics = [self.request_seconds, self.sql_statements, self.sql_seconds, self.request_statements,
+                        self.template_seconds, self.chart_seconds]
+        # Gauges read from a callback at scrape time, e.g. the chart renderer's or score queue's stats()
+        self.collectors = []
+
+    def add_collector(self, name, help, collect):
+        self.collectors.append((f'{self.prefix}_{name}', help, collect))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for name, help, collect in self.collectors:
+            values = collect()
+            if values is None:
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# HELP {name}_{key} {help}")
+                lines.append(f"# TYPE {name}_{key} gauge")
+                lines.append(f"{name}_{key} {format_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or NO_ENDPOINT
+    return NO_ENDPOINT
+
+
+# Request latency per endpoint, and how many statements each request ran
+def instrument_app(app, metrics):
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = 0
+
+    @app.teardown_request
+    def record_request(error):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        endpoint = request.endpoint or NO_ENDPOINT
+        status = g.pop('metrics_status', 500 if error is not None else 200)
+        metrics.request_seconds.observe(time.perf_counter() - started, (endpoint, request.method, str(status)))
+        metrics.request_statements.observe(g.pop('metrics_statements', 0), (endpoint,))
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    # Blinker holds receivers weakly by default; these closures would be collected right away
+    def template_started(sender, template, context, **extra):
+        g.setdefault('metrics_templates', []).append(time.perf_counter())
+
+    def template_finished(sender, template, context, **extra):
+        starts = g.get('metrics_templates')
+        if starts:
+            metrics.template_seconds.observe(time.perf_counter() - starts.pop(), (template.name or 'string',))
+
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
+
+
+# Count and time every statement the engine runs, labelled with the endpoint that ran it
+def instrument_engine(engine, metrics):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_started')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        endpoint = current_endpoint()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        metrics.sql_statements.inc((endpoint, operation))
+        metrics.sql_seconds.observe(elapsed, (endpoint, operation))
+        if has_request_context() and 'metrics_statements' in g:
+            g.metrics_statements += 1
+
+    # A failed statement never reaches after_cursor_execute
+    @event.listens_for(engine, 'handle_error')
+    def discard_statement(context):
+        connection = context.connection
+        starts = connection.info.get('metrics_started') if connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,343 @@
+import random
+import threading
+import time
+
+# In-memory leaderboards: per quiz (score, then time taken), per subject and overall (total score over the
+# attempted quizzes, then total time). Each board is an indexable skiplist, so adding a score, top-N and
+# "my rank" all take O(log n) instead of sorting the Score table on every view.
+MAX_LEVELS = 32
+# Rounds of journal replay a reload runs outside the lock before swapping in the new standings
+REPLAY_ROUNDS = 3
+
+
+class Last:
+    # Sorts after every key; ends each level of the skiplist
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+class Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, next, width):
+        self.key = key
+        self.next = next
+        # width[level] is how many positions next[level] is ahead of this node
+        self.width = width
+
+
+END = Node(Last(), [], [])
+
+
+# Each node reaches one level higher with probability 1/2: one plus the trailing zero bits of a random number
+def random_levels():
+    bits = random.getrandbits(MAX_LEVELS - 1)
+    return (bits & -bits).bit_length() if bits else MAX_LEVELS
+
+
+# Sorted collection of unique keys with positional access (after R. Hettinger's indexable skiplist)
+class RankedIndex:
+    def __init__(self):
+        self.size = 0
+        self.head = Node(None, [END] * MAX_LEVELS, [1] * MAX_LEVELS)
+
+    def __len__(self):
+        return self.size
+
+    # Build from keys that are already sorted in O(n), linking each level left to right
+    @classmethod
+    def from_sorted(cls, keys):
+        index = cls()
+        last = [index.head] * MAX_LEVELS
+        last_position = [-1] * MAX_LEVELS
+        for position, key in enumerate(keys):
+            levels = random_levels()
+            node = Node(key, [END] * levels, [0] * levels)
+            for level in range(levels):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+        index.size = len(keys)
+        for level in range(MAX_LEVELS):
+            last[level].next[level] = END
+            last[level].width[level] = index.size - last_position[level]
+        return index
+
+    def insert(self, key):
+        chain = [None] * MAX_LEVELS
+        steps_at_level = [0] * MAX_LEVELS
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        levels = random_levels()
+        new_node = Node(key, [None] * levels, [None] * levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * MAX_LEVELS
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target is END or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    # 0-based position of a key that is in the index
+    def position(self, key):
+        position = -1
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position + 1
+
+    # Up to count keys starting at position start
+    def slice(self, start, count):
+        if start >= self.size:
+            return []
+        node = self.head
+        remaining = start + 1
+        for level in reversed(range(MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not END and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+# One ranking of users: the best is the most points, then the fewest seconds
+class Leaderboard:
+    def __init__(self):
+        self.index = RankedIndex()
+        self.keys = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    # A board from {user_id: (points, seconds)}
+    @classmethod
+    def build(cls, entries):
+        board = cls()
+        keys = sorted((-points, seconds, user_id) for user_id, (points, seconds) in entries.items())
+        board.keys = {key[2]: key for key in keys}
+        board.index = RankedIndex.from_sorted(keys)
+        return board
+
+    def set(self, user_id, points, seconds):
+        self.discard(user_id)
+        key = (-points, seconds, user_id)
+        self.keys[user_id] = key
+        self.index.insert(key)
+
+    def discard(self, user_id):
+        key = self.keys.pop(user_id, None)
+        if key is not None:
+            self.index.remove(key)
+
+    # [(rank, user_id, points, seconds)], ranks starting at 1
+    def top(self, count, offset=0):
+        return [(offset + number + 1, key[2], -key[0], key[1]) for number, key in enumerate(self.index.slice(offset, count))]
+
+    # (rank, points, seconds) of a user, or None when the user is not on this board
+    def rank(self, user_id):
+        key = self.keys.get(user_id)
+        if key is None:
+            return None
+        return self.index.position(key) + 1, -key[0], key[1]
+
+
+# Every board, built from the individual attempts so that recording the same attempt twice changes nothing
+class Standings:
+    def __init__(self):
+        # (user_id, quiz_id) -> (subject_id, score, time_taken)
+        self.attempts = {}
+        # ('subject', subject_id, user_id) or ('overall', user_id) -> [points, seconds, attempts]
+        self.totals = {}
+        self.quizzes = {}
+        self.subjects = {}
+        self.overall = Leaderboard()
+
+    def add_total(self, board, total_key, user_id, points, seconds, attempts):
+        total = self.totals.setdefault(total_key, [0, 0, 0])
+        total[0] += points
+        total[1] += seconds
+        total[2] += attempts
+        if total[2] > 0:
+            board.set(user_id, total[0], total[1])
+        else:
+            board.discard(user_id)
+            del self.totals[total_key]
+
+    # Fill empty standings from rows of (user_id, quiz_id, subject_id, score, time_taken), sorting each board
+    # once instead of inserting the rows one by one
+    def load(self, rows):
+        for user_id, quiz_id, subject_id, score, time_taken in rows:
+            self.attempts[(user_id, quiz_id)] = (subject_id, score, time_taken)
+        quiz_entries = {}
+        for (user_id, quiz_id), (subject_id, score, time_taken) in self.attempts.items():
+            quiz_entries.setdefault(quiz_id, {})[user_id] = (score, time_taken)
+            for total_key in (('subject', subject_id, user_id), ('overall', user_id)):
+                total = self.totals.setdefault(total_key, [0, 0, 0])
+                total[0] += score
+                total[1] += time_taken
+                total[2] += 1
+        subject_entries = {}
+        overall_entries = {}
+        for total_key, (points, seconds, attempts) in self.totals.items():
+            if total_key[0] == 'subject':
+                subject_entries.setdefault(total_key[1], {})[total_key[2]] = (points, seconds)
+            else:
+                overall_entries[total_key[1]] = (points, seconds)
+        self.quizzes = {quiz_id: Leaderboard.build(entries) for quiz_id, entries in quiz_entries.items()}
+        self.subjects = {subject_id: Leaderboard.build(entries) for subject_id, entries in subject_entries.items()}
+        self.overall = Leaderboard.build(overall_entries)
+
+    def apply(self, user_id, quiz_id, subject_id, score, time_taken):
+        attempt = (subject_id, score, time_taken)
+        old = self.attempts.get((user_id, quiz_id))
+        if old == attempt:
+            return
+        if old is not None:
+            old_subject_id, old_score, old_time = old
+            self.add_total(self.subjects[old_subject_id], ('subject', old_subject_id, user_id), user_id, -old_score, -old_time, -1)
+            self.add_total(self.overall, ('overall', user_id), user_id, -old_score, -old_time, -1)
+        self.attempts[(user_id, quiz_id)] = attempt
+        self.quizzes.setdefault(quiz_id, Leaderboard()).set(user_id, score, time_taken)
+        self.add_total(self.subjects.setdefault(subject_id, Leaderboard()), ('subject', subject_id, user_id), user_id, score, time_taken, 1)
+        self.add_total(self.overall, ('overall', user_id), user_id, score, time_taken, 1)
+
+
+# The boards of one worker process. They are loaded from the database on first use, kept current by record()
+# for the scores this process writes, and reloaded every reconcile_interval seconds to pick up scores written
+# by other processes and admin changes (deleted quizzes, re-grades).
+class Leaderboards:
+    def __init__(self, reconcile_interval=300, clock=time.monotonic):
+        self.reconcile_interval = reconcile_interval
+        self.clock = clock
+        self.standings = Standings()
+        self.loaded = False
+        self.lock = threading.Lock()
+        # Reentrant, as ensure_loaded holds it around reload
+        self.reload_lock = threading.RLock()
+        # Scores recorded while a reload reads the database, replayed onto the new standings
+        self.journal = None
+        self.next_reconcile = 0
+        self.counters = {'recorded': 0, 'reloads': 0, 'corrections': 0}
+
+    def record(self, user_id, quiz_id, subject_id, score, time_taken):
+        with self.lock:
+            if self.journal is not None:
+                self.journal.append((user_id, quiz_id, subject_id, score, time_taken))
+            # Before the first load there is nothing to update; the load reads the score from the database
+            if self.loaded:
+                self.standings.apply(user_id, quiz_id, subject_id, score, time_taken)
+                self.counters['recorded'] += 1
+
+    # Rebuild from rows of (user_id, quiz_id, subject_id, score, time_taken); returns how many attempts differed.
+    # The new standings are built, compared and caught up outside self.lock; record() and view() only wait for the swap.
+    def reload(self, rows):
+        with self.reload_lock:
+            with self.lock:
+                self.journal = []
+            try:
+                standings = Standings()
+                standings.load(rows)
+                # Attempts this worker had wrong; the old standings only change through record(), which journals
+                # the change, so attempts recorded meanwhile are left out below
+                old = self.standings
+                differing = {key for key in old.attempts.keys() | standings.attempts.keys()
+                             if old.attempts.get(key) != standings.attempts.get(key)} if self.loaded else set()
+                recorded = set()
+                # Replay what was recorded meanwhile in a few rounds, each shorter than the last; only what
+                # arrives during the final round is replayed under the lock
+                for _ in range(REPLAY_ROUNDS):
+                    with self.lock:
+                        pending = self.journal
+                        self.journal = []
+                    if not pending:
+                        break
+                    for row in pending:
+                        standings.apply(*row)
+                        recorded.add((row[0], row[1]))
+                with self.lock:
+                    for row in self.journal:
+                        standings.apply(*row)
+                        recorded.add((row[0], row[1]))
+                    corrections = len(differing - recorded)
+                    self.standings = standings
+                    self.loaded = True
+                    self.journal = None
+                    self.next_reconcile = self.clock() + self.reconcile_interval
+                    self.counters['reloads'] += 1
+                    self.counters['corrections'] += corrections
+            except Exception:
+                with self.lock:
+                    self.journal = None
+                raise
+            return corrections
+
+    def ensure_loaded(self, load):
+        if self.loaded:
+            return
+        with self.reload_lock:
+            if not self.loaded:
+                self.reload(load())
+
+    # True once per reconcile_interval, for the caller to start a reload
+    def claim_reconcile(self):
+        with self.lock:
+            if not self.loaded or self.clock() < self.next_reconcile:
+                return False
+            self.next_reconcile = self.clock() + self.reconcile_interval
+            return True
+
+    # Reconcile at the next opportunity, e.g. after an admin change to scores or quizzes
+    def invalidate(self):
+        with self.lock:
+            self.next_reconcile = 0
+
+    # Top entries and the user's own rank, read under the lock so both come from the same standings
+    def view(self, kind, board_id, user_id, count):
+        with self.lock:
+            if kind == 'quiz':
+                board = self.standings.quizzes.get(board_id, Leaderboard())
+            elif kind == 'subject':
+                board = self.standings.subjects.get(board_id, Leaderboard())
+            else:
+                board = self.standings.overall
+            return board.top(count), board.rank(user_id), len(board)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, loaded=int(self.loaded), attempts=len(self.standings.attempts),
+                        quiz_boards=len(self.standings.quizzes), subject_boards=len(self.standings.subjects))
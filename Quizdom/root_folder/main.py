@@ -1,21 +1,103 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, abort, Response, stream_with_context
+from markupsafe import Markup
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
-import matplotlib
-matplotlib.use('Agg')
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import io
+import json
+import hashlib
+import hmac
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
+import socket
+import atexit
+import gc
+import threading
+import time
+import click
+from charts import ChartCache, DataVersions
+from chart_service import ChartRenderer, ChartTimeout
+from password_service import PasswordHasher, HasherBusy
+from pagination import keyset_paginate, ranked_paginate, page_args
+import search_index
+import migrations
+from quiz_cache import QuizCache
+from leaderboard import Leaderboards
+import grading
+import question_io
+import score_queue as score_queue_module
+import attempt_sessions
+import database
+import instrumentation
+import compression
 
 # Step 1: Initialize Flask App & Database
 db = SQLAlchemy()  
 
 def initialize_quizdom_app():
     app_instance = Flask(__name__, template_folder="templates")
-    app_instance.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quizdomdata.db'  
-    app_instance.config['CHART_FOLDER'] = os.path.join('static', 'charts')
-    os.makedirs(app_instance.config['CHART_FOLDER'], exist_ok=True)
+    # SQLite by default; the URL, SQLite pragmas and pool are set through QUIZDOM_* environment variables (see database.py)
+    app_instance.config['SQLALCHEMY_DATABASE_URI'] = database.database_url(os.environ)
+    app_instance.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options(app_instance.config['SQLALCHEMY_DATABASE_URI'], os.environ)
+    app_instance.config['SQLITE_PRAGMAS'] = database.sqlite_pragmas(os.environ)
+    # 'browser' draws the summary charts in the page from their JSON data; 'server' renders PNGs with matplotlib
+    app_instance.config['SUMMARY_CHARTS'] = 'browser'
+    # Seconds a browser may reuse the chart data before revalidating it; 0 revalidates (usually a 304) on every view
+    app_instance.config['CHART_DATA_MAX_AGE'] = 0
+    app_instance.config['CHART_CACHE_MAX_ENTRIES'] = 256
+    app_instance.config['CHART_CACHE_MAX_BYTES'] = 32 * 1024 * 1024
+    # Charts are drawn in a pool of processes; at most CHART_RENDER_QUEUE renders are queued or running
+    app_instance.config['CHART_RENDER_WORKERS'] = min(4, os.cpu_count() or 1)
+    app_instance.config['CHART_RENDER_QUEUE'] = 16
+    app_instance.config['CHART_RENDER_TIMEOUT'] = 10
+    # Werkzeug hashing method and cost for passwords; after raising the cost (e.g. 'scrypt:65536:8:1' or
+    # 'pbkdf2:sha256:1000000'), older hashes are upgraded as their users log in
+    app_instance.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'
+    # Passwords are hashed in a pool of processes; beyond PASSWORD_HASH_QUEUE pending hashes, or after waiting
+    # PASSWORD_HASH_TIMEOUT seconds, a login or registration is asked to try again
+    app_instance.config['PASSWORD_HASH_WORKERS'] = min(4, os.cpu_count() or 1)
+    app_instance.config['PASSWORD_HASH_QUEUE'] = 64
+    app_instance.config['PASSWORD_HASH_TIMEOUT'] = 5
+    app_instance.config['PAGE_SIZE'] = 20
+    app_instance.config['MAX_PAGE_SIZE'] = 100
+    # Use the SQLite FTS5 index for searches; falls back to LIKE matching when unavailable
+    app_instance.config['FULL_TEXT_SEARCH'] = True
+    app_instance.config['SEARCH_RESULT_LIMIT'] = 1000
+    app_instance.config['QUIZ_CACHE_MAX_ENTRIES'] = 256
+    # Rendered quiz and subject cards of the management pages and quiz rows of Upcomming-Quizzes kept per worker
+    app_instance.config['FRAGMENT_CACHE_MAX_ENTRIES'] = 2048
+    # gzip (or brotli, when installed) text responses of at least COMPRESS_MIN_SIZE bytes, and give pages an ETag
+    app_instance.config['COMPRESS_RESPONSES'] = True
+    app_instance.config['COMPRESS_MIN_SIZE'] = 500
+    # Entries shown on a leaderboard page, and how often (seconds) each worker reloads its in-memory
+    # leaderboards from Score to pick up scores written by other workers and admin changes
+    app_instance.config['LEADERBOARD_SIZE'] = 10
+    app_instance.config['LEADERBOARD_RECONCILE_INTERVAL'] = 300
+    # Questions written per transaction by the bulk import
+    app_instance.config['IMPORT_BATCH_SIZE'] = 1000
+    # Write-behind mode: submissions go to a local append log and a background thread writes them to Score in batches
+    app_instance.config['SCORE_QUEUE'] = False
+    app_instance.config['SCORE_QUEUE_PATH'] = os.path.join(app_instance.instance_path, 'score_queue.db')
+    app_instance.config['SCORE_QUEUE_BATCH_SIZE'] = 500
+    app_instance.config['SCORE_QUEUE_INTERVAL'] = 0.5
+    app_instance.config['SCORE_QUEUE_MAX_PENDING'] = 10000
+    # Attempts older than SCORE_ARCHIVE_AFTER_DAYS are moved from Score to ScoreArchive by `flask --app main
+    # archive-scores` (e.g. from cron), or every SCORE_ARCHIVE_INTERVAL seconds in the app when that is above 0
+    app_instance.config['SCORE_ARCHIVE_AFTER_DAYS'] = 365
+    app_instance.config['SCORE_ARCHIVE_INTERVAL'] = 0
+    app_instance.config['SCORE_ARCHIVE_BATCH_SIZE'] = 5000
+    # Request, SQL, template and chart timings served at /Metrics; set QUIZDOM_METRICS=on to enable. When off nothing is hooked in
+    app_instance.config['METRICS'] = os.environ.get('QUIZDOM_METRICS', 'off').strip().lower() in ('1', 'on', 'true', 'yes')
+    # Lets a Prometheus scraper read /Metrics with an `Authorization: Bearer <token>` header instead of an admin login
+    app_instance.config['METRICS_TOKEN'] = os.environ.get('QUIZDOM_METRICS_TOKEN', '').strip() or None
+    # Quiz attempts in progress (start, deadline, autosaved answers): 'memory' for one process, 'sqlite' to share
+    # ATTEMPT_STORE_PATH between the worker processes of one machine, or a redis:// URL (needs pip install redis)
+    app_instance.config['ATTEMPT_STORE'] = 'memory'
+    app_instance.config['ATTEMPT_STORE_PATH'] = os.path.join(app_instance.instance_path, 'attempts.db')
+    # Seconds an attempt is kept after its deadline before it expires
+    app_instance.config['ATTEMPT_TTL'] = 3600
+    # Seconds after the deadline a submission still counts in full, for the timer's auto-submit to arrive
+    app_instance.config['ATTEMPT_GRACE_SECONDS'] = 30
     app_instance.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app_instance.config['SECRET_KEY'] = 'quizdom123'
 
@@ -24,6 +106,68 @@ def initialize_quizdom_app():
 
 # Step 2: Create an Instance of Flask App
 app = initialize_quizdom_app()
+chart_cache = ChartCache(app.config['CHART_CACHE_MAX_ENTRIES'], app.config['CHART_CACHE_MAX_BYTES'])
+# The pool processes are only started by the first chart render
+chart_renderer = ChartRenderer(chart_cache, app.config['CHART_RENDER_WORKERS'], app.config['CHART_RENDER_QUEUE'], app.config['CHART_RENDER_TIMEOUT'])
+atexit.register(chart_renderer.shutdown)
+# Like the chart pool, the hashing processes start with the first login
+password_hasher = PasswordHasher(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'],
+                                 app.config['PASSWORD_HASH_QUEUE'], app.config['PASSWORD_HASH_TIMEOUT'])
+atexit.register(password_hasher.shutdown)
+quiz_cache = QuizCache(app.config['QUIZ_CACHE_MAX_ENTRIES'])
+# Same cache, keyed by (fragment, id) and versioned by what the fragment shows
+fragment_cache = QuizCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+leaderboards = Leaderboards(app.config['LEADERBOARD_RECONCILE_INTERVAL'])
+attempt_store = attempt_sessions.open_store(app.config['ATTEMPT_STORE'], app.config['ATTEMPT_STORE_PATH'], app.config['ATTEMPT_TTL'])
+summary_versions = DataVersions()
+# Set at startup when SCORE_QUEUE is enabled
+score_queue = None
+# Set at startup when METRICS is enabled
+metrics = None
+
+# Image URL of a chart, or None when the render queue is full and the page should show it as unavailable
+def chart_url(spec):
+    key = chart_renderer.request(spec)
+    return url_for('chart_image', chart_key=key) if key else None
+
+# JSON response with an ETag (a hash of the body) and Last-Modified, answered with 304 Not Modified when the
+# browser's copy is still current. The data is per user, so only the browser may cache it.
+def conditional_json(scope, payload):
+    body = json.dumps(payload, separators=(',', ':'))
+    etag = hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = summary_versions.changed_at(scope, etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = app.config['CHART_DATA_MAX_AGE']
+    response.cache_control.must_revalidate = True
+    return response.make_conditional(request)
+
+# Listing routes show one keyset page at a time, ordered by id
+def paginate(query, key_column, key=lambda row: row.id):
+    return keyset_paginate(query, key_column, key, **page_args(request.args, app.config['PAGE_SIZE'], app.config['MAX_PAGE_SIZE']))
+
+# Search results keep their rank order; only the rows on the current page are loaded
+def paginate_ranked(query, key_column, ranked_ids):
+    load = lambda ids: query.filter(key_column.in_(ids)).all()
+    return ranked_paginate(ranked_ids, load, lambda row: row.id, **page_args(request.args, app.config['PAGE_SIZE'], app.config['MAX_PAGE_SIZE']))
+
+# Whether searches can use the FTS5 index, which init-db creates; looked up once per process
+search_available = None
+
+def full_text_search():
+    global search_available
+    if not app.config['FULL_TEXT_SEARCH']:
+        return False
+    if search_available is None:
+        search_available = db.engine.dialect.name == 'sqlite' and search_index.index_exists(db.session)
+    return search_available
+
+# Ranked ids from the full-text index, or None when there is no search or the index is unavailable
+def search_ranked_ids(kinds, search_query):
+    if not search_query or not full_text_search():
+        return None
+    return search_index.search_ids(db.session, kinds, search_query, app.config['SEARCH_RESULT_LIMIT'])
 
 # Step 3: Define Database Models
 class User(db.Model):
@@ -40,10 +184,14 @@ class User(db.Model):
     scores = db.relationship('Score', back_populates='user')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-    
+        self.password_hash = password_hasher.hash(password)
+
+    # Upgrades a hash made with outdated parameters; the caller commits
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        matches, new_hash = password_hasher.verify(self.password_hash, password)
+        if new_hash is not None:
+            self.password_hash = new_hash
+        return matches
 
 class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -56,7 +204,7 @@ class Chapter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False, index=True)
 
     subject = db.relationship('Subject', back_populates='chapters')
     quiz = db.relationship('Quiz', back_populates='chapter', cascade="all, delete")
@@ -64,18 +212,23 @@ class Chapter(db.Model):
 class Quiz(db.Model):
     id = db.Column(db.Integer, unique=True, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
-    date_of_quiz = db.Column(db.DateTime, default=datetime.utcnow)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True)
+    date_of_quiz = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     time_duration = db.Column(db.Integer, nullable=False)
     remarks = db.Column(db.Text, nullable=False)
+    # Stored so percentages never need to load the questions; maintained by the question routes
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped whenever the quiz or its questions change, so every worker's cached copy goes stale
+    version = db.Column(db.Integer, nullable=False, default=0)
 
     questions = db.relationship('Question', back_populates='quiz', cascade="all, delete")
     chapter = db.relationship('Chapter', back_populates='quiz')
     scores = db.relationship('Score', back_populates='quiz', cascade="all, delete")
+    archived_scores = db.relationship('ScoreArchive', cascade="all, delete")
 
 class Question(db.Model):
     id = db.Column(db.Integer, unique=True, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
     question_text = db.Column(db.Text, nullable=False)
     option1 = db.Column(db.String(100), nullable=False)
     option2 = db.Column(db.String(100), nullable=False)
@@ -86,17 +239,313 @@ class Question(db.Model):
     quiz = db.relationship('Quiz', back_populates='questions')
 
 class Score(db.Model):
+    # One attempt per user and quiz; the index also serves lookups by user_id alone. AUTOINCREMENT stops SQLite
+    # from reusing the ids of archived attempts, which ScoreArchive keeps
+    __table_args__ = (db.Index('ix_score_user_quiz', 'user_id', 'quiz_id', unique=True), {'sqlite_autoincrement': True})
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
     score = db.Column(db.Integer, nullable=False)
     date_taken = db.Column(db.DateTime, default=datetime.utcnow)
     time_taken = db.Column(db.Integer, nullable=False)
     completed = db.Column(db.Boolean, default=False)
+    # The submitted options packed by grading.pack_answers, kept so attempts can be re-graded
+    answers = db.Column(db.LargeBinary)
 
     user = db.relationship('User', back_populates='scores')
     quiz = db.relationship('Quiz', back_populates='scores')
 
+# Attempts moved out of Score by archive_scores, keeping their ids. The rollups and leaderboards count both tables,
+# so Score only holds recent attempts and stays small for the queries that run on every page.
+class ScoreArchive(db.Model):
+    __table_args__ = (db.Index('ix_score_archive_user_quiz', 'user_id', 'quiz_id', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
+    score = db.Column(db.Integer, nullable=False)
+    date_taken = db.Column(db.DateTime)
+    time_taken = db.Column(db.Integer, nullable=False)
+    answers = db.Column(db.LargeBinary)
+
+ARCHIVE_COLUMNS = ['id', 'user_id', 'quiz_id', 'score', 'date_taken', 'time_taken', 'answers']
+
+# Which process runs a background job that must run only once across workers, until expires_at
+class JobLease(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+# Hot and archived attempts as one UNION ALL, optionally of one user and some quizzes; source is 0 for Score
+# and 1 for ScoreArchive
+def all_attempts(user_id=None, quiz_ids=None):
+    selects = []
+    for source, model in enumerate((Score, ScoreArchive)):
+        criteria = []
+        if user_id is not None:
+            criteria.append(model.user_id == user_id)
+        if quiz_ids is not None:
+            criteria.append(model.quiz_id.in_(quiz_ids))
+        selects.append(db.select(model.id, model.user_id, model.quiz_id, model.score, model.date_taken, model.time_taken,
+                                 db.literal(source, db.Integer).label('source')).where(*criteria))
+    return db.union_all(*selects)
+
+# Whether the user has a hot or archived attempt at the quiz, in one query
+def has_attempted(user_id, quiz_id):
+    return db.session.query(db.or_(
+        db.exists().where(Score.user_id == user_id, Score.quiz_id == quiz_id),
+        db.exists().where(ScoreArchive.user_id == user_id, ScoreArchive.quiz_id == quiz_id)
+    )).scalar()
+
+# Rollup tables read by the summary pages, kept up to date by attempt_quiz
+class SubjectStats(db.Model):
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_score = db.Column(db.Integer, nullable=False, default=0)
+    max_percentage = db.Column(db.Float, nullable=False, default=0)
+    total_time = db.Column(db.Integer, nullable=False, default=0)
+
+class UserSubjectStats(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_score = db.Column(db.Integer, nullable=False, default=0)
+    max_percentage = db.Column(db.Float, nullable=False, default=0)
+    total_time = db.Column(db.Integer, nullable=False, default=0)
+
+# Add attempts to a rollup row, inserting it on first use; an upsert keeps concurrent submissions from losing counts
+def upsert_rollup(model, keys, score, percentage, time_taken, attempts=1):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Imported here so SQLite deployments do not load the PostgreSQL dialect at startup
+        from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+        statement = postgresql_insert(model)
+    else:
+        statement = sqlite_insert(model)
+    statement = statement.values(**keys, attempts=attempts, max_score=score, max_percentage=percentage, total_time=time_taken)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            'attempts': model.attempts + statement.excluded.attempts,
+            'max_score': db.case((statement.excluded.max_score > model.max_score, statement.excluded.max_score), else_=model.max_score),
+            'max_percentage': db.case((statement.excluded.max_percentage > model.max_percentage, statement.excluded.max_percentage), else_=model.max_percentage),
+            'total_time': model.total_time + statement.excluded.total_time
+        }
+    )
+    db.session.execute(statement)
+
+def record_score_rollups(score, subject_id, percentage):
+    upsert_rollup(SubjectStats, {'subject_id': subject_id}, score.score, percentage, score.time_taken)
+    upsert_rollup(UserSubjectStats, {'user_id': score.user_id, 'subject_id': subject_id}, score.score, percentage, score.time_taken)
+
+# Write a batch of queued submissions to Score with their rollups in one transaction; returns how many were
+# dropped because the user already has an attempt for that quiz
+def flush_score_submissions(submissions):
+    pairs = [(submission['user_id'], submission['quiz_id']) for submission in submissions]
+    stored = set(db.session.execute(db.union_all(*(
+        db.select(model.user_id, model.quiz_id).where(db.tuple_(model.user_id, model.quiz_id).in_(pairs)) for model in (Score, ScoreArchive)
+    ))).all())
+    new_submissions = [submission for submission in submissions if (submission['user_id'], submission['quiz_id']) not in stored]
+    try:
+        insert_score_batch(new_submissions)
+        db.session.commit()
+    except IntegrityError:
+        # Another process stored one of these attempts since the check; fall back to one transaction per submission
+        db.session.rollback()
+        duplicates = len(submissions) - len(new_submissions)
+        for submission in new_submissions:
+            try:
+                insert_score_batch([submission])
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                duplicates += 1
+                continue
+            record_leaderboard_scores([submission])
+        return duplicates
+    record_leaderboard_scores(new_submissions)
+    return len(submissions) - len(new_submissions)
+
+def record_leaderboard_scores(submissions):
+    for submission in submissions:
+        leaderboards.record(submission['user_id'], submission['quiz_id'], submission['subject_id'], submission['score'], submission['time_taken'])
+
+def insert_score_batch(submissions):
+    if not submissions:
+        return
+    db.session.execute(db.insert(Score), [{
+        'user_id': submission['user_id'], 'quiz_id': submission['quiz_id'], 'score': submission['score'],
+        'date_taken': datetime.fromisoformat(submission['date_taken']), 'time_taken': submission['time_taken'],
+        'completed': True, 'answers': submission['answers']
+    } for submission in submissions])
+    # One upsert per rollup row instead of one per submission
+    rollups = {}
+    for submission in submissions:
+        for model, keys in ((SubjectStats, (('subject_id', submission['subject_id']),)),
+                            (UserSubjectStats, (('user_id', submission['user_id']), ('subject_id', submission['subject_id'])))):
+            attempts, max_score, max_percentage, total_time = rollups.get((model, keys), (0, 0, 0, 0))
+            rollups[(model, keys)] = (attempts + 1, max(max_score, submission['score']),
+                                      max(max_percentage, submission['percentage']), total_time + submission['time_taken'])
+    for (model, keys), (attempts, max_score, max_percentage, total_time) in rollups.items():
+        upsert_rollup(model, dict(keys), max_score, max_percentage, total_time, attempts)
+
+def start_score_queue():
+    def flush(submissions):
+        with app.app_context():
+            return flush_score_submissions(submissions)
+    queue = score_queue_module.ScoreQueue(
+        app.config['SCORE_QUEUE_PATH'], flush,
+        batch_size=app.config['SCORE_QUEUE_BATCH_SIZE'],
+        interval=app.config['SCORE_QUEUE_INTERVAL'],
+        max_pending=app.config['SCORE_QUEUE_MAX_PENDING']
+    )
+    queue.start(on_error=lambda error: app.logger.exception("Score queue flush failed", exc_info=error))
+    # Write out what is still queued when the process exits
+    atexit.register(queue.stop)
+    return queue
+
+@app.cli.command('score-queue')
+@click.option('--flush', is_flag=True, help='Write every pending submission to the database now.')
+def score_queue_command(flush):
+    """Show the write-behind score queue metrics."""
+    if not os.path.exists(app.config['SCORE_QUEUE_PATH']):
+        print("⚠️ There is no score queue.")
+        return
+    queue = score_queue if score_queue is not None else score_queue_module.ScoreQueue(app.config['SCORE_QUEUE_PATH'], flush_score_submissions)
+    if flush:
+        queue.drain()
+    for name, value in queue.stats().items():
+        print(f"{name}: {value}")
+
+# Number of questions in each quiz counted from the Question table, used to verify Quiz.question_count
+def quiz_question_counts():
+    return db.session.query(
+        Question.quiz_id.label('quiz_id'),
+        db.func.count(Question.id).label('total_questions')
+    ).group_by(Question.quiz_id).subquery()
+
+# Score as a percentage of its own quiz, capped at 100 and 0 for quizzes without questions
+def score_percentage(score=Score.score):
+    percentage = score * 100.0 / Quiz.question_count
+    return db.case(
+        (Quiz.question_count == 0, 0),
+        (percentage > 100, 100),
+        else_=percentage
+    )
+
+# Quizzes whose stored question_count disagrees with the Question table, with the real count
+def find_question_count_drift():
+    question_counts = quiz_question_counts()
+    actual_count = db.func.coalesce(question_counts.c.total_questions, 0)
+    return db.session.query(Quiz, actual_count)\
+        .outerjoin(question_counts, question_counts.c.quiz_id == Quiz.id)\
+        .filter(Quiz.question_count != actual_count)\
+        .all()
+
+def repair_question_counts():
+    drift = find_question_count_drift()
+    for quiz, actual_count in drift:
+        quiz.question_count = actual_count
+    return len(drift)
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Re-index all subjects, chapters, quizzes, questions and users for search."""
+    if not full_text_search():
+        print("⚠️ Full-text search is not available on this database.")
+        return
+    search_index.rebuild_search_index(db.session)
+    db.session.commit()
+    print("✅ Search index rebuilt.")
+
+@app.cli.command('check-question-counts')
+@click.option('--repair', is_flag=True, help='Overwrite wrong counts with the real number of questions.')
+def check_question_counts_command(repair):
+    """Verify the stored question count of every quiz."""
+    drift = find_question_count_drift()
+    for quiz, actual_count in drift:
+        print(f"⚠️ Quiz {quiz.id} ({quiz.title}): stored {quiz.question_count}, actual {actual_count}")
+    if repair and drift:
+        repair_question_counts()
+        db.session.commit()
+        print(f"✅ Repaired {len(drift)} quizzes.")
+    elif not drift:
+        print("✅ All question counts are correct.")
+
+# Recompute the rollups from Score for the given subjects (or all of them); the caller commits
+def rebuild_rollups(subject_ids=None):
+    subject_filter = [] if subject_ids is None else [Subject.id.in_(subject_ids)]
+    stats_query = SubjectStats.query
+    user_stats_query = UserSubjectStats.query
+    if subject_ids is not None:
+        stats_query = stats_query.filter(SubjectStats.subject_id.in_(subject_ids))
+        user_stats_query = user_stats_query.filter(UserSubjectStats.subject_id.in_(subject_ids))
+    stats_query.delete(synchronize_session=False)
+    user_stats_query.delete(synchronize_session=False)
+
+    # One aggregate query per table over hot and archived attempts, inserted straight from the SELECT
+    attempt = all_attempts().subquery('attempt')
+    columns = ['attempts', 'max_score', 'max_percentage', 'total_time']
+    aggregates = [
+        db.func.count(attempt.c.id),
+        db.func.max(attempt.c.score),
+        db.func.max(score_percentage(attempt.c.score)),
+        db.func.sum(attempt.c.time_taken)
+    ]
+    for model, keys in ((SubjectStats, [Subject.id]), (UserSubjectStats, [attempt.c.user_id, Subject.id])):
+        aggregate_query = db.select(*keys, *aggregates)\
+            .select_from(attempt)\
+            .join(Quiz, attempt.c.quiz_id == Quiz.id)\
+            .join(Chapter, Quiz.chapter_id == Chapter.id)\
+            .join(Subject, Chapter.subject_id == Subject.id)\
+            .where(*subject_filter)\
+            .group_by(*keys)
+        key_columns = ['subject_id'] if model is SubjectStats else ['user_id', 'subject_id']
+        db.session.execute(db.insert(model).from_select(key_columns + columns, aggregate_query))
+    # Whatever changed the scores also changed the leaderboards
+    leaderboards.invalidate()
+
+# (user_id, quiz_id, subject_id, score, time_taken) of every attempt, streamed into the leaderboards
+def leaderboard_rows():
+    attempt = all_attempts().subquery('attempt')
+    return db.session.query(attempt.c.user_id, attempt.c.quiz_id, Chapter.subject_id, attempt.c.score, attempt.c.time_taken)\
+        .join(Quiz, attempt.c.quiz_id == Quiz.id)\
+        .join(Chapter, Quiz.chapter_id == Chapter.id)\
+        .yield_per(10000)
+
+def reconcile_leaderboards():
+    with app.app_context():
+        try:
+            corrections = leaderboards.reload(leaderboard_rows())
+        except Exception:
+            app.logger.exception("Reconciling the leaderboards failed")
+            return
+        if corrections:
+            app.logger.info("Leaderboards reconciled, %s attempts corrected", corrections)
+
+# The leaderboards, loaded on first use in this worker; once they are due, they are reconciled in the background
+def current_leaderboards():
+    leaderboards.ensure_loaded(leaderboard_rows)
+    if leaderboards.claim_reconcile():
+        threading.Thread(target=reconcile_leaderboards, name='leaderboard-reconcile', daemon=True).start()
+    return leaderboards
+
+# Load the leaderboards before serving; python main.py does this, other servers can call it from a worker startup hook
+def warm_leaderboards():
+    with app.app_context():
+        leaderboards.ensure_loaded(leaderboard_rows)
+    # Once per worker, before it serves: the app and the boards live as long as the process, and full collections
+    # walking all of their nodes showed up as request latency spikes. Frozen objects are never collected, hence only here.
+    gc.collect()
+    gc.freeze()
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Backfill the summary rollup tables from the Score table."""
+    rebuild_rollups()
+    db.session.commit()
+    print(f"✅ Rebuilt rollups for {SubjectStats.query.count()} subjects.")
+
 # Step 4: Create an Admin User (Avoiding Duplicate Admin Creation)
 def create_admin_user():
     with app.app_context():
@@ -114,19 +563,288 @@ def create_admin_user():
             db.session.commit()
             print("✅ Admin user created!")
         else:
-            # Update the admin password if it already exists
-            admin.set_password('admin123')
-            db.session.commit()
+            # The existing password is kept; it is not re-hashed on every start
             print("⚠️ Admin user already exists.")
 
 
+# Everything attempt_quiz needs, cached per quiz version: details, answer key and rendered questions
+def load_quiz_payload(quiz_id):
+    quiz = Quiz.query.options(db.joinedload(Quiz.chapter)).get(quiz_id)
+    questions = Question.query.filter_by(quiz_id=quiz_id).order_by(Question.id).all()
+    return {
+        'id': quiz.id,
+        'title': quiz.title,
+        'remarks': quiz.remarks,
+        'time_duration': quiz.time_duration,
+        'subject_id': quiz.chapter.subject_id,
+        'answer_key': grading.AnswerKey([question.id for question in questions], [question.correct_option for question in questions]),
+        'questions_html': Markup(render_template('quiz_questions.html', questions=questions))
+    }
+
+# Re-grade every stored attempt of a quiz against its current answer key; the caller commits
+def regrade_quiz(quiz_id):
+    questions = db.session.query(Question.id, Question.correct_option).filter_by(quiz_id=quiz_id).all()
+    key = grading.AnswerKey([question.id for question in questions], [question.correct_option for question in questions])
+    regraded = 0
+    # Archived attempts are re-graded too, so the rollups rebuilt from both tables stay consistent
+    for model in (Score, ScoreArchive):
+        attempts = db.session.query(model.id, model.answers).filter(model.quiz_id == quiz_id, model.answers.isnot(None)).all()
+        if not attempts:
+            continue
+        new_scores = grading.grade_batch(key, [grading.unpack_answers(attempt.answers) for attempt in attempts])
+        db.session.execute(db.update(model), [{'id': attempt.id, 'score': int(new_score)} for attempt, new_score in zip(attempts, new_scores)])
+        regraded += len(attempts)
+    # Attempts stored before the answers were kept cannot be re-graded; their score is capped at the question count
+    for model in (Score, ScoreArchive):
+        regraded += db.session.execute(db.update(model).where(
+            model.quiz_id == quiz_id, model.answers.is_(None), model.score > len(questions)
+        ).values(score=len(questions))).rowcount
+    if not regraded:
+        return 0
+    rebuild_rollups([Quiz.query.get(quiz_id).chapter.subject_id])
+    return regraded
+
+@app.cli.command('regrade-quiz')
+@click.argument('quiz_id', type=int)
+def regrade_quiz_command(quiz_id):
+    """Re-grade all attempts of a quiz against its current answers."""
+    regraded = regrade_quiz(quiz_id)
+    db.session.commit()
+    print(f"✅ Re-graded {regraded} attempts.")
+
+# Move the attempts taken before cutoff from Score to ScoreArchive, batch_size per transaction; returns how many
+# moved. The rollups and leaderboards already count them and read both tables, so they need no update.
+def archive_scores(cutoff, batch_size=5000):
+    moved = 0
+    while True:
+        # The oldest attempts have the lowest ids; bounding each batch by id keeps the statements free of id lists
+        batch = db.select(Score.id).where(Score.date_taken < cutoff).order_by(Score.id).limit(batch_size).subquery()
+        last_id = db.session.scalar(db.select(db.func.max(batch.c.id)))
+        if last_id is None:
+            return moved
+        criteria = [Score.id <= last_id, Score.date_taken < cutoff]
+        db.session.execute(db.insert(ScoreArchive).from_select(
+            ARCHIVE_COLUMNS, db.select(*[getattr(Score, name) for name in ARCHIVE_COLUMNS]).where(*criteria)
+        ))
+        moved += db.session.execute(db.delete(Score).where(*criteria)).rowcount
+        db.session.commit()
+
+def archive_old_scores():
+    cutoff = datetime.utcnow() - timedelta(days=app.config['SCORE_ARCHIVE_AFTER_DAYS'])
+    return archive_scores(cutoff, app.config['SCORE_ARCHIVE_BATCH_SIZE'])
+
+@app.cli.command('archive-scores')
+@click.option('--days', type=int, help='Archive attempts older than this many days (default: SCORE_ARCHIVE_AFTER_DAYS).')
+def archive_scores_command(days):
+    """Move old attempts from the Score table to the archive."""
+    if days is not None:
+        app.config['SCORE_ARCHIVE_AFTER_DAYS'] = days
+    moved = archive_old_scores()
+    print(f"✅ Archived {moved} attempts; {Score.query.count()} recent and {ScoreArchive.query.count()} archived attempts.")
+
+# Take or renew the lease on a job for seconds; True if this process holds it. The holder renews it every run,
+# another process takes over once it has expired (the holder stopped). Commits.
+def claim_job(name, seconds, holder=None):
+    holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+    now = datetime.utcnow()
+    claimed = db.session.execute(db.update(JobLease).where(
+        JobLease.name == name, db.or_(JobLease.holder == holder, JobLease.expires_at < now)
+    ).values(holder=holder, expires_at=now + timedelta(seconds=seconds))).rowcount
+    if not claimed:
+        # No lease yet, or another process holds it and the insert fails
+        db.session.add(JobLease(name=name, holder=holder, expires_at=now + timedelta(seconds=seconds)))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+# Archive old attempts every SCORE_ARCHIVE_INTERVAL seconds in a background thread. Every worker starts one;
+# only the worker holding the job lease archives, the others wait to take over
+def start_score_archiver():
+    def run():
+        while True:
+            time.sleep(app.config['SCORE_ARCHIVE_INTERVAL'])
+            with app.app_context():
+                try:
+                    if not claim_job('score-archiver', app.config['SCORE_ARCHIVE_INTERVAL'] * 2):
+                        continue
+                    moved = archive_old_scores()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Archiving scores failed")
+                    continue
+                if moved:
+                    app.logger.info("Archived %s attempts", moved)
+    threading.Thread(target=run, name='score-archiver', daemon=True).start()
+
+def bump_quiz_version(quiz):
+    quiz.version = Quiz.version + 1
+    invalidate_quiz(quiz.id)
+
+def invalidate_quiz(quiz_id):
+    quiz_cache.invalidate(quiz_id)
+    fragment_cache.invalidate(('quiz_card', quiz_id))
+    fragment_cache.invalidate(('quiz_row', quiz_id))
+
+# More questions lower the percentage of every attempt at the quiz; the caller commits
+def rebuild_quiz_rollups(quiz_ids):
+    subject_ids = db.session.query(Chapter.subject_id).join(Quiz, Quiz.chapter_id == Chapter.id)\
+        .filter(Quiz.id.in_(quiz_ids)).distinct().all()
+    rebuild_rollups([subject_id for subject_id, in subject_ids])
+
+# Bulk import of a question file; the imported quizzes' cached copies are dropped here, other workers see the new version
+def import_question_file(stream, file_format, create_missing=True):
+    rows = question_io.iter_rows(stream, file_format)
+    result = question_io.import_questions(db.session, rows, app.config['IMPORT_BATCH_SIZE'], create_missing,
+                                          before_commit=rebuild_quiz_rollups)
+    for quiz_id in result.quiz_ids:
+        invalidate_quiz(quiz_id)
+    return result
+
+# Cached fragments are checked against values the page loads anyway, so a change made through another worker
+# is never served stale; the CRUD routes also drop this worker's copy right away.
+# A quiz's card and row show the quiz (its version covers questions too), its chapter title and subject name
+def quiz_fragment_version(quiz):
+    return (quiz.version, quiz.chapter.title, quiz.chapter.subject.name)
+
+def subject_fragment_version(subject):
+    return (subject.name, subject.description, tuple((chapter.id, chapter.title, chapter.description) for chapter in subject.chapters))
+
+def render_fragment(template, **context):
+    return Markup(render_template(template, **context))
+
+# Manage-Quizzes cards; the questions of the quizzes that are not cached are loaded in one query
+def quiz_cards(quizzes):
+    cards = {quiz.id: fragment_cache.lookup(('quiz_card', quiz.id), quiz_fragment_version(quiz)) for quiz in quizzes}
+    missing = [quiz_id for quiz_id, card in cards.items() if card is None]
+    if missing:
+        questions = {quiz_id: [] for quiz_id in missing}
+        for question in Question.query.filter(Question.quiz_id.in_(missing)).order_by(Question.id):
+            questions[question.quiz_id].append(question)
+        for quiz in quizzes:
+            if cards[quiz.id] is None:
+                cards[quiz.id] = fragment_cache.get(('quiz_card', quiz.id), quiz_fragment_version(quiz),
+                                                    lambda: render_fragment('quiz_card.html', quiz=quiz, questions=questions[quiz.id]))
+    return [cards[quiz.id] for quiz in quizzes]
+
+@app.cli.command('import-questions')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--no-create', is_flag=True, help='Skip rows whose subject, chapter or quiz does not exist instead of creating it.')
+def import_questions_command(path, no_create):
+    """Import questions from a CSV or JSON file."""
+    file_format = question_io.detect_format(path)
+    if file_format is None:
+        print("⚠️ The file must be .csv, .json or .jsonl.")
+        return
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        result = import_question_file(stream, file_format, create_missing=not no_create)
+    for error in result.errors:
+        print(f"⚠️ {error}")
+    created = ', '.join(f"{count} {kind}" for kind, count in result.created.items())
+    print(f"✅ Imported {result.imported} questions, skipped {result.skipped}." + (f" Created {created}." if created else ""))
+
+@app.cli.command('export-questions')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+def export_questions_command(path):
+    """Export every question to a CSV or JSON file."""
+    file_format = question_io.detect_format(path)
+    if file_format is None:
+        print("⚠️ The file must be .csv, .json or .jsonl.")
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        for chunk in question_io.export_questions(db.session, file_format, app.config['IMPORT_BATCH_SIZE']):
+            output.write(chunk)
+    print(f"✅ Exported questions to {path}.")
+
 # Step 5: Initialize the Database (Run Once)
-app.app_context().push()
-with app.app_context():
+# New databases are created at the latest schema version; older ones are migrated forward
+def upgrade_schema():
+    connection = db.session.connection()
+    if not db.inspect(connection).has_table('quiz'):
+        db.create_all()
+        migrations.set_version(db.session.connection(), migrations.LATEST_VERSION)
+        db.session.commit()
+        return []
     db.create_all()
+    applied = migrations.upgrade(db.session.connection())
+    db.session.commit()
+    # Fill the rollups the first time they exist alongside existing scores, or after a migration emptied them
+    if SubjectStats.query.first() is None and (Score.query.first() is not None or ScoreArchive.query.first() is not None):
+        rebuild_rollups()
+        db.session.commit()
+        applied.append('Rebuild the summary rollups')
+    return applied
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations and fill empty rollups."""
+    applied = upgrade_schema()
+    for name in applied:
+        print(f"✅ Applied: {name}")
+    print(f"Schema is at version {migrations.current_version(db.session.connection())}.")
+
+@app.cli.command('database-info')
+def database_info_command():
+    """Show the database in use and its connection settings."""
+    print(f"Database: {db.engine.url.render_as_string(hide_password=True)}")
+    print(f"Pool: {db.engine.pool.status()}")
+    if db.engine.dialect.name == 'sqlite':
+        for name, value in database.current_pragmas(db.session.connection(), app.config['SQLITE_PRAGMAS'] or ['journal_mode']).items():
+            print(f"PRAGMA {name}: {value}")
+
+# Hook the instrumentation into the app, the engine and the chart renderer
+def start_metrics():
+    collected = instrumentation.Metrics()
+    instrumentation.instrument_app(app, collected)
+    instrumentation.instrument_engine(db.engine, collected)
+    chart_renderer.observer = lambda kind, seconds: collected.chart_seconds.observe(seconds, (kind,))
+    collected.add_collector('chart_renderer', 'Chart renderer counter.', chart_renderer.stats)
+    collected.add_collector('password_hasher', 'Password hashing counter.', password_hasher.stats)
+    collected.add_collector('quiz_cache', 'Quiz cache counter.', quiz_cache.stats)
+    collected.add_collector('fragment_cache', 'Rendered fragment cache counter.', fragment_cache.stats)
+    collected.add_collector('attempt_store', 'Quiz attempts in progress.', attempt_store.stats)
+    collected.add_collector('leaderboards', 'Leaderboard counter.', leaderboards.stats)
+    collected.add_collector('score_queue', 'Score queue counter.', lambda: score_queue.stats() if score_queue is not None else None)
+    return collected
+
+# Schema, admin user, search index and rollups. Run once per deployment with `flask --app main init-db`
+# (python main.py does it before starting the development server), never on import, so workers start fast.
+def init_database():
+    global search_available
+    applied = upgrade_schema()
     create_admin_user()
+    # Full-text search needs SQLite with FTS5; other databases keep LIKE matching
+    if app.config['FULL_TEXT_SEARCH']:
+        search_available = db.engine.dialect.name == 'sqlite' and search_index.create_search_index(db.session)
+        db.session.commit()
+    return applied
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database, the admin user and the search index."""
+    for name in init_database():
+        print(f"✅ Applied: {name}")
+    print("✅ Database ready.")
+
+app.app_context().push()
+with app.app_context():
+    database.install_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+    if app.config['COMPRESS_RESPONSES']:
+        compression.compress_responses(app, app.config['COMPRESS_MIN_SIZE'])
+    if app.config['METRICS']:
+        metrics = start_metrics()
+    # Under `python main.py` the chart pool processes import this file as __mp_main__; they must not flush scores
+    if app.config['SCORE_QUEUE'] and __name__ != '__mp_main__':
+        score_queue = start_score_queue()
+    if app.config['SCORE_ARCHIVE_INTERVAL'] > 0 and __name__ != '__mp_main__':
+        start_score_archiver()
 
 # Step 6: Define Application Routes
+# Shown when the password hashing pool is full, e.g. when a whole class logs in at the start of an exam
+BUSY_MESSAGE = 'The server is busy, please try again in a moment.'
+
 @app.route('/')
 def home():
     return render_template('home.html')
@@ -137,7 +855,14 @@ def admin_login():
         username_or_email = request.form.get('username_or_email')  
         password = request.form['password']
         user = User.query.filter((User.username == username_or_email) | (User.email == username_or_email)).first()
-        if user and user.check_password(password):  
+        try:
+            valid = user is not None and user.check_password(password)
+        except HasherBusy:
+            return render_template('admin_login.html', error=BUSY_MESSAGE), 503, {'Retry-After': '1'}
+        if valid:
+            if db.session.is_modified(user):
+                # check_password upgraded the hash
+                db.session.commit()
             if user.username == 'admin': 
                 session['username'] = 'admin'
                 return redirect(url_for('admin_dashboard'))  
@@ -163,7 +888,11 @@ def user_register():
                 return render_template('user_registration.html', error="This account is blocked. Please contact the admin.")
             return render_template('user_registration.html', error="Username or Email already exists!")
         # Create new user
-        user = User(username=username, email=email, fullname=fullname, qualification=qualification, dob=dob, password_hash=generate_password_hash(password))
+        try:
+            password_hash = password_hasher.hash(password)
+        except HasherBusy:
+            return render_template('user_registration.html', error=BUSY_MESSAGE), 503, {'Retry-After': '1'}
+        user = User(username=username, email=email, fullname=fullname, qualification=qualification, dob=dob, password_hash=password_hash)
         db.session.add(user)
         db.session.commit()
         # Redirect to the login page after successful registration
@@ -176,7 +905,14 @@ def user_login():
         username_or_email = request.form.get('username_or_email')  
         password = request.form['password']
         user = User.query.filter((User.username == username_or_email) | (User.email == username_or_email)).first()
-        if user and user.check_password(password): 
+        try:
+            valid = user is not None and user.check_password(password)
+        except HasherBusy:
+            return render_template('user_login.html', error=BUSY_MESSAGE), 503, {'Retry-After': '1'}
+        if valid:
+            if db.session.is_modified(user):
+                # check_password upgraded the hash
+                db.session.commit()
             if not user.is_active:  # Check if the user is blocked
                 return render_template('user_login.html', error='Your account is blocked. Please contact the admin.')
             session['username'] = user.username 
@@ -192,62 +928,95 @@ def admin_dashboard():
         return redirect(url_for('admin_login'))
     return render_template('admin_dashboard.html')
 
+# Per-subject attempts and top scores over all users, read from the precomputed rollups instead of the Score table
+def admin_summary_stats():
+    subject_stats = db.session.query(
+        Subject.name,
+        db.func.sum(SubjectStats.attempts).label('attempts'),
+        db.func.max(SubjectStats.max_percentage).label('max_percentage')
+    ).join(Subject, SubjectStats.subject_id == Subject.id)\
+     .group_by(Subject.name)\
+     .order_by(Subject.name)\
+     .all()
+    # Top scores are stored as percentages of the quiz they were scored on
+    return {
+        'subjects': [subject.name for subject in subject_stats],
+        'top_scores': [subject.max_percentage for subject in subject_stats],
+        'attempts': [subject.attempts for subject in subject_stats]
+    }
+
 @app.route('/Admin-Summary', methods=['GET', 'POST'])
 def admin_summary():
     if session.get('username') != 'admin':
         return redirect(url_for('admin_login'))
 
-    subject_attempts = db.session.query(Subject.name, db.func.count(Score.user_id)).join(Quiz, Score.quiz_id == Quiz.id).join(Chapter, Quiz.chapter_id == Chapter.id).join(Subject, Chapter.subject_id == Subject.id).group_by(Subject.name).all()
-    sub_dict = dict(subject_attempts)
-
-    topscorers = db.session.query(Subject.name, db.func.max(Score.score)).join(Quiz, Score.quiz_id == Quiz.id).join(Chapter, Quiz.chapter_id == Chapter.id).join(Subject, Chapter.subject_id == Subject.id).group_by(Subject.name).all()
-    top_dict = dict(topscorers)
-
-    # Convert scores to percentages
-    bar_labels = list(top_dict.keys())
-    bar_values = [min(100, (score / len(Quiz.query.filter_by(id=Score.quiz_id).first().questions) * 100)) if Quiz.query.filter_by(id=Score.quiz_id).first() else 0 for score in top_dict.values()]
+    # The page draws the charts itself from the JSON data
+    if app.config['SUMMARY_CHARTS'] == 'browser':
+        return render_template('admin_summary.html', chart_data_url=url_for('admin_summary_data'))
 
+    stats = admin_summary_stats()
     pie_labels = []
     pie_values = []
-    for key, value in sub_dict.items():
-        if value > 0:
-            pie_labels.append(key)
-            pie_values.append(value)
-
-    # Top scores bar chart
-    plt.figure(figsize=(8, 6), facecolor='#E0FFFF')
-    sns.barplot(x=bar_labels, y=bar_values)
-    plt.xlabel('Subjects')
-    plt.ylabel('Top Scores (%)')  # Update y-axis label to indicate percentages
-    plt.title('Top Scores by Subject')
-    bar_chart_path = os.path.join(app.config['CHART_FOLDER'], 'bar_chart.png')
-    plt.savefig(bar_chart_path)
-    plt.close()
-
-    bar_chart_url = url_for('static', filename='charts/bar_chart.png')
+    for name, attempts in zip(stats['subjects'], stats['attempts']):
+        if attempts > 0:
+            pie_labels.append(name)
+            pie_values.append(attempts)
+
+    # Top scores bar chart; rendering starts here and the image request waits for it
+    bar_chart_url = chart_url({
+        'kind': 'bar',
+        'facecolor': '#E0FFFF',
+        'labels': stats['subjects'],
+        'values': stats['top_scores'],
+        'xlabel': 'Subjects',
+        'ylabel': 'Top Scores (%)',
+        'title': 'Top Scores by Subject'
+    })
 
     # Pie chart for subject-wise attempts
-    plt.figure(figsize=(8, 6), facecolor='#E0FFFF')
-    plt.pie(pie_values, labels=pie_labels, autopct='%1.1f%%')
-    plt.axis('equal')
-    plt.title('Subject-wise User Attempts')
-    pie_chart_path = os.path.join(app.config['CHART_FOLDER'], 'pie_chart.png')
-    plt.savefig(pie_chart_path)
-    plt.close()
-
-    pie_chart_url = url_for('static', filename='charts/pie_chart.png')
+    pie_chart_url = chart_url({
+        'kind': 'pie',
+        'facecolor': '#E0FFFF',
+        'labels': pie_labels,
+        'values': pie_values,
+        'title': 'Subject-wise User Attempts'
+    })
 
     return render_template('admin_summary.html', bar_chart_url=bar_chart_url, pie_chart_url=pie_chart_url)
-    return render_template('admin_summary.html', bar_chart_url=bar_chart_url, pie_chart_url=pie_chart_url)
+
+@app.route('/Admin-Summary/Data')
+def admin_summary_data():
+    if session.get('username') != 'admin':
+        abort(403)
+    return conditional_json('admin', admin_summary_stats())
+
+# Prometheus text format; for the admin, or a scraper holding METRICS_TOKEN. 404 unless METRICS is enabled
+@app.route('/Metrics')
+def metrics_page():
+    if metrics is None:
+        abort(404)
+    token = app.config['METRICS_TOKEN']
+    scraper = token is not None and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if session.get('username') != 'admin' and not scraper:
+        abort(403)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/Manage-Subjects')
 def manage_subjects():
     search_query = request.args.get('search', '').lower()
-    subjects = Subject.query.filter(
-        (Subject.name.ilike(f'%{search_query}%')) |
-        (Subject.description.ilike(f'%{search_query}%'))
-    ).all()
-    return render_template('subject_management.html', subjects=subjects)
+    # Load every subject's chapters in one extra query instead of one per subject
+    subjects_query = Subject.query.options(db.selectinload(Subject.chapters))
+    ranked_ids = search_ranked_ids(['subject'], search_query)
+    if ranked_ids is not None:
+        page = paginate_ranked(subjects_query, Subject.id, ranked_ids)
+    else:
+        page = paginate(subjects_query.filter(
+            (Subject.name.ilike(f'%{search_query}%')) |
+            (Subject.description.ilike(f'%{search_query}%'))
+        ), Subject.id)
+    subject_cards = [fragment_cache.get(('subject_card', subject.id), subject_fragment_version(subject),
+                                        lambda: render_fragment('subject_card.html', subject=subject)) for subject in page.items]
+    return render_template('subject_management.html', subject_cards=subject_cards, page=page)
 
 @app.route('/New-Subject', methods=['GET', 'POST'])
 def new_subject():
@@ -267,14 +1036,23 @@ def edit_subject(subject_id):
         subject.name = request.form['name']
         subject.description = request.form['description']
         db.session.commit()
+        fragment_cache.invalidate(('subject_card', subject_id))
         return redirect(url_for('manage_subjects'))
     return render_template('subject_management.html')  
 
 @app.route('/Delete-Subject/<int:subject_id>')
 def delete_subject(subject_id):
     subject = Subject.query.get(subject_id)
+    quiz_ids = [quiz.id for chapter in subject.chapters for quiz in chapter.quiz]
+    # The subject's rollup rows reference it, so they go first; with its quizzes gone there is nothing to rebuild
+    SubjectStats.query.filter_by(subject_id=subject_id).delete(synchronize_session=False)
+    UserSubjectStats.query.filter_by(subject_id=subject_id).delete(synchronize_session=False)
     db.session.delete(subject)
     db.session.commit()
+    leaderboards.invalidate()
+    fragment_cache.invalidate(('subject_card', subject_id))
+    for quiz_id in quiz_ids:
+        invalidate_quiz(quiz_id)
     return redirect(url_for('manage_subjects')) 
 
 @app.route('/New-Chapter/<int:subject_id>', methods=['GET', 'POST'])
@@ -286,6 +1064,7 @@ def new_chapter(subject_id):
         chapter = Chapter(title=chap_name, description=chap_description, subject=subject)
         db.session.add(chapter)
         db.session.commit()
+        fragment_cache.invalidate(('subject_card', subject_id))
         return redirect(url_for('manage_subjects'))
     return render_template('subject_management.html')     
 
@@ -296,26 +1075,43 @@ def edit_chapter(chapter_id):
         chapter.title = request.form['name']
         chapter.description = request.form['description']
         db.session.commit()
+        fragment_cache.invalidate(('subject_card', chapter.subject_id))
         return redirect(url_for('manage_subjects'))
     return render_template('subject_management.html')  
 
 @app.route('/Delete-Chapter/<int:chapter_id>')
 def delete_chapter(chapter_id):
     chapter = Chapter.query.get(chapter_id)
+    subject_id = chapter.subject_id
+    quiz_ids = [quiz.id for quiz in chapter.quiz]
     db.session.delete(chapter)
+    db.session.flush()
+    rebuild_rollups([subject_id])
     db.session.commit()
+    fragment_cache.invalidate(('subject_card', subject_id))
+    for quiz_id in quiz_ids:
+        invalidate_quiz(quiz_id)
     return redirect(url_for('manage_subjects'))  
 
 @app.route('/Manage-Quizzes')
 def manage_quizzes():
     search_query = request.args.get('search', '').lower()
-    quizzes = Quiz.query.join(Chapter).join(Subject).filter(
-        (Quiz.title.ilike(f'%{search_query}%')) |
-        (Chapter.title.ilike(f'%{search_query}%')) |
-        (Subject.name.ilike(f'%{search_query}%'))
-    ).all()
+    # Chapter and subject come from the search join; questions are only loaded for cards that are not cached
+    quizzes_query = Quiz.query.join(Chapter).join(Subject).options(
+        db.contains_eager(Quiz.chapter).contains_eager(Chapter.subject)
+    )
+    # Admins can also find a quiz by the text of its questions
+    ranked_ids = search_ranked_ids(['quiz', 'question'], search_query)
+    if ranked_ids is not None:
+        page = paginate_ranked(quizzes_query, Quiz.id, ranked_ids)
+    else:
+        page = paginate(quizzes_query.filter(
+            (Quiz.title.ilike(f'%{search_query}%')) |
+            (Chapter.title.ilike(f'%{search_query}%')) |
+            (Subject.name.ilike(f'%{search_query}%'))
+        ), Quiz.id)
     chapters = Chapter.query.all()
-    return render_template('quiz_management.html', quizzes=quizzes, chapters=chapters)
+    return render_template('quiz_management.html', quiz_cards=quiz_cards(page.items), chapters=chapters, page=page)
 
 @app.route('/New-Quiz', methods=['GET', 'POST'])
 def new_quiz():
@@ -342,6 +1138,7 @@ def new_quiz():
 def edit_quiz(quiz_id):
     quiz = Quiz.query.get(quiz_id)
     if request.method == 'POST':
+        old_subject_id = quiz.chapter.subject_id
         quiz.title = request.form['title']
         quiz.chapter_id = request.form['chapter_id']
         quiz.date_of_quiz = datetime.strptime(request.form['date_of_quiz'], '%Y-%m-%d')
@@ -352,6 +1149,12 @@ def edit_quiz(quiz_id):
         quiz.time_duration = time_hours * 60 + time_minutes
         
         quiz.remarks = request.form['remarks']
+        bump_quiz_version(quiz)
+        # Moving a quiz to another subject moves its attempts between rollups
+        db.session.flush()
+        new_subject_id = Chapter.query.get(quiz.chapter_id).subject_id
+        if new_subject_id != old_subject_id:
+            rebuild_rollups([old_subject_id, new_subject_id])
         db.session.commit()
         return redirect(url_for('manage_quizzes'))
     return render_template('quiz_management.html')
@@ -359,8 +1162,12 @@ def edit_quiz(quiz_id):
 @app.route('/Delete-Quiz/<int:quiz_id>')
 def delete_quiz(quiz_id):
     quiz = Quiz.query.get(quiz_id)
+    subject_id = quiz.chapter.subject_id
     db.session.delete(quiz)
+    db.session.flush()
+    rebuild_rollups([subject_id])
     db.session.commit()
+    invalidate_quiz(quiz_id)
     return redirect(url_for('manage_quizzes'))
 
 @app.route('/New-Question/<int:quiz_id>', methods=['GET', 'POST'])
@@ -375,6 +1182,11 @@ def new_question(quiz_id):
         correct_option = request.form['correct_option']
         question = Question(quiz_id=quiz_id, question_text=question_text, option1=option1, option2=option2, option3=option3, option4=option4, correct_option=correct_option)
         db.session.add(question)
+        quiz.question_count = Quiz.question_count + 1
+        bump_quiz_version(quiz)
+        db.session.flush()
+        # Percentages change with the question count
+        rebuild_rollups([quiz.chapter.subject_id])
         db.session.commit()
         return redirect(url_for('manage_quizzes'))
     return render_template('quiz_management.html')
@@ -388,7 +1200,13 @@ def edit_question(question_id):
         question.option2 = request.form['option2']
         question.option3 = request.form['option3']
         question.option4 = request.form['option4']
+        answer_changed = str(question.correct_option) != request.form['correct_option']
         question.correct_option = request.form['correct_option']
+        bump_quiz_version(question.quiz)
+        db.session.flush()
+        # Attempts already submitted are graded again against the corrected answer
+        if answer_changed:
+            regrade_quiz(question.quiz_id)
         db.session.commit()
         return redirect(url_for('manage_quizzes'))
     return render_template('edit_question.html', question=question)
@@ -396,19 +1214,58 @@ def edit_question(question_id):
 @app.route('/Delete-Question/<int:question_id>')
 def delete_question(question_id):
     question = Question.query.get(question_id)
+    quiz_id = question.quiz_id
+    subject_id = question.quiz.chapter.subject_id
+    question.quiz.question_count = Quiz.question_count - 1
+    bump_quiz_version(question.quiz)
     db.session.delete(question)
+    db.session.flush()
+    # Attempts are graded again without the question; percentages change with the question count either way
+    if not regrade_quiz(quiz_id):
+        rebuild_rollups([subject_id])
     db.session.commit()
     return redirect(url_for('manage_quizzes'))    
 
+@app.route('/Import-Questions', methods=['POST'])
+def import_questions():
+    if session.get('username') != 'admin':
+        return redirect(url_for('admin_login'))
+    upload = request.files.get('file')
+    file_format = question_io.detect_format(upload.filename) if upload else None
+    if file_format is None:
+        flash('Please upload a .csv, .json or .jsonl file', 'error')
+        return redirect(url_for('manage_quizzes'))
+    # The upload is parsed as it is read, never held in memory as a whole
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    result = import_question_file(stream, file_format, create_missing=request.form.get('create_missing') == 'on')
+    flash(f'Imported {result.imported} questions, skipped {result.skipped}', 'success' if not result.skipped else 'warning')
+    for error in result.errors[:10]:
+        flash(error, 'error')
+    return redirect(url_for('manage_quizzes'))
+
+@app.route('/Export-Questions.<file_format>')
+def export_questions(file_format):
+    if session.get('username') != 'admin':
+        return redirect(url_for('admin_login'))
+    if file_format not in question_io.MIMETYPES:
+        abort(404)
+    chunks = question_io.export_questions(db.session, file_format, app.config['IMPORT_BATCH_SIZE'])
+    return Response(stream_with_context(chunks), mimetype=question_io.MIMETYPES[file_format],
+                    headers={'Content-Disposition': f'attachment; filename=questions.{file_format}'})
+
 @app.route('/Manage-Users')
 def manage_users():
     search_query = request.args.get('search', '').lower()
-    users = User.query.filter(
-        (User.username.ilike(f'%{search_query}%')) |
-        (User.email.ilike(f'%{search_query}%')) |
-        (User.fullname.ilike(f'%{search_query}%'))
-    ).all()
-    return render_template('user_management.html', users=users)
+    ranked_ids = search_ranked_ids(['user'], search_query)
+    if ranked_ids is not None:
+        page = paginate_ranked(User.query, User.id, ranked_ids)
+    else:
+        page = paginate(User.query.filter(
+            (User.username.ilike(f'%{search_query}%')) |
+            (User.email.ilike(f'%{search_query}%')) |
+            (User.fullname.ilike(f'%{search_query}%'))
+        ), User.id)
+    return render_template('user_management.html', users=page.items, page=page)
 
 @app.route('/Block-User/<int:user_id>', methods=['POST'])
 def block_user(user_id):
@@ -431,66 +1288,74 @@ def user_dashboard():
         return redirect(url_for('user_login')) 
     return render_template('user_dashboard.html')
 
-@app.route('/User-Summary')
-def user_summary():
-    if session.get('username') is None:
-        return redirect(url_for('user_login'))
-
-    user_id = session['user_id']
-
-    # Subject-wise top scores for the user
-    subject_top_scores = db.session.query(
+# Subject-wise top scores and attempts for one user, read from the rollups
+def user_summary_stats(user_id):
+    subject_stats = db.session.query(
         Subject.name,
-        db.func.max(Score.score).label('top_score')
-    ).join(Quiz, Score.quiz_id == Quiz.id)\
-     .join(Chapter, Quiz.chapter_id == Chapter.id)\
-     .join(Subject, Chapter.subject_id == Subject.id)\
-     .filter(Score.user_id == user_id)\
+        db.func.sum(UserSubjectStats.attempts).label('attempts'),
+        db.func.max(UserSubjectStats.max_percentage).label('max_percentage')
+    ).join(Subject, UserSubjectStats.subject_id == Subject.id)\
+     .filter(UserSubjectStats.user_id == user_id)\
      .group_by(Subject.name)\
+     .order_by(Subject.name)\
      .all()
+    return {
+        'subjects': [subject.name for subject in subject_stats],
+        'top_scores': [subject.max_percentage for subject in subject_stats],
+        'attempts': [subject.attempts for subject in subject_stats]
+    }
 
-    # Convert scores to percentages
-    top_score_labels = [subject.name for subject in subject_top_scores]
-    top_score_values = [min(100, (subject.top_score / len(Quiz.query.filter_by(id=Score.quiz_id).first().questions)) * 100) if Quiz.query.filter_by(id=Score.quiz_id).first() else 0 for subject in subject_top_scores]
+@app.route('/User-Summary')
+def user_summary():
+    if session.get('username') is None:
+        return redirect(url_for('user_login'))
 
-    # Subject-wise quizzes attempted by the user
-    subject_attempts = db.session.query(
-        Subject.name,
-        db.func.count(Score.quiz_id).label('attempts')
-    ).join(Quiz, Score.quiz_id == Quiz.id)\
-     .join(Chapter, Quiz.chapter_id == Chapter.id)\
-     .join(Subject, Chapter.subject_id == Subject.id)\
-     .filter(Score.user_id == user_id)\
-     .group_by(Subject.name)\
-     .all()
+    if app.config['SUMMARY_CHARTS'] == 'browser':
+        return render_template('user_summary.html', chart_data_url=url_for('user_summary_data'))
 
-    attempts_labels = [subject.name for subject in subject_attempts]
-    attempts_values = [subject.attempts for subject in subject_attempts]
+    stats = user_summary_stats(session['user_id'])
 
     # Top scores bar chart
-    plt.figure(figsize=(8, 6), facecolor='#E5F0F8')
-    sns.barplot(x=top_score_labels, y=top_score_values)
-    plt.xlabel('Subjects')
-    plt.ylabel('Top Scores (%)')  # Update y-axis label to indicate percentages
-    plt.title('Subject-wise Top Scores')
-    top_scores_chart_path = os.path.join(app.config['CHART_FOLDER'], 'top_scores_chart.png')
-    plt.savefig(top_scores_chart_path)
-    plt.close()
+    top_scores_chart_url = chart_url({
+        'kind': 'bar',
+        'facecolor': '#E5F0F8',
+        'labels': stats['subjects'],
+        'values': stats['top_scores'],
+        'xlabel': 'Subjects',
+        'ylabel': 'Top Scores (%)',
+        'title': 'Subject-wise Top Scores'
+    })
 
     # Attempts shown in pie chart
-    plt.figure(figsize=(8, 6), facecolor='#E5F0F8')
-    plt.pie(attempts_values, labels=attempts_labels, autopct='%1.1f%%')
-    plt.axis('equal')
-    plt.title('Subject-wise Quizzes Attempted')
-    attempts_chart_path = os.path.join(app.config['CHART_FOLDER'], 'attempts_chart.png')
-    plt.savefig(attempts_chart_path)
-    plt.close()
-
-    # URLs for the charts
-    top_scores_chart_url = url_for('static', filename='charts/top_scores_chart.png')
-    attempts_chart_url = url_for('static', filename='charts/attempts_chart.png')
+    attempts_chart_url = chart_url({
+        'kind': 'pie',
+        'facecolor': '#E5F0F8',
+        'labels': stats['subjects'],
+        'values': stats['attempts'],
+        'title': 'Subject-wise Quizzes Attempted'
+    })
+
+    return render_template('user_summary.html', top_scores_chart_url=top_scores_chart_url, attempts_chart_url=attempts_chart_url)
+
+@app.route('/User-Summary/Data')
+def user_summary_data():
+    if session.get('username') is None:
+        abort(403)
+    user_id = session['user_id']
+    return conditional_json(f'user:{user_id}', user_summary_stats(user_id))
 
-    return render_template('user_summary.html', top_scores_chart_url=top_scores_chart_url, attempts_chart_url=attempts_chart_url)  
+# Charts are rendered in memory and served by the hash of their data, so the URL never changes for the same image
+@app.route('/Charts/<chart_key>.png')
+def chart_image(chart_key):
+    if session.get('username') is None:
+        return redirect(url_for('user_login'))
+    try:
+        png = chart_renderer.wait(chart_key)
+    except ChartTimeout:
+        return 'The chart is still being drawn, please try again.', 503, {'Retry-After': '2'}
+    if png is None:
+        abort(404)
+    return send_file(io.BytesIO(png), mimetype='image/png', max_age=86400)
 
 @app.route('/Upcomming-Quizzes')
 def upcomming_quizzes():
@@ -500,45 +1365,83 @@ def upcomming_quizzes():
     # Get the search query from the URL parameters
     search_query = request.args.get('search', '').lower()
     
-    # Fetch quizzes based on the search query
-    quizzes = Quiz.query.join(Chapter).join(Subject).filter(
-        (Quiz.title.ilike(f'%{search_query}%')) |  # Search by quiz title
-        (Chapter.title.ilike(f'%{search_query}%')) |  # Search by chapter title
-        (Subject.name.ilike(f'%{search_query}%'))  # Search by subject name
-    ).all()
+    # Fetch quizzes based on the search query (quiz title, chapter title or subject name)
+    quizzes_query = Quiz.query.join(Chapter).join(Subject).options(
+        db.contains_eager(Quiz.chapter).contains_eager(Chapter.subject)
+    )
+    ranked_ids = search_ranked_ids(['quiz'], search_query)
+    if ranked_ids is not None:
+        page = paginate_ranked(quizzes_query, Quiz.id, ranked_ids)
+    else:
+        page = paginate(quizzes_query.filter(
+            (Quiz.title.ilike(f'%{search_query}%')) |  # Search by quiz title
+            (Chapter.title.ilike(f'%{search_query}%')) |  # Search by chapter title
+            (Subject.name.ilike(f'%{search_query}%'))  # Search by subject name
+        ), Quiz.id)
+
+    # Only this user's scores for the quizzes on this page, fetched in one query
+    user_scores = {}
+    quiz_ids = [quiz.id for quiz in page.items]
+    for score in db.session.execute(all_attempts(session['user_id'], quiz_ids)).all():
+        user_scores.setdefault(score.quiz_id, []).append(score)
     
-    return render_template('upcomming_quizzes.html', quizzes=quizzes)
+    # Submissions still waiting in the score queue
+    pending_quiz_ids = score_queue.pending_quiz_ids(session['user_id']) if score_queue is not None else set()
+    # The quiz details cells are the same for every user
+    quiz_rows = {quiz.id: fragment_cache.get(('quiz_row', quiz.id), quiz_fragment_version(quiz),
+                                             lambda: render_fragment('quiz_row.html', quiz=quiz)) for quiz in page.items}
+    return render_template('upcomming_quizzes.html', quizzes=page.items, quiz_rows=quiz_rows, user_scores=user_scores,
+                           pending_quiz_ids=pending_quiz_ids, page=page)
 
 @app.route('/Attempt-Quiz/<int:quiz_id>', methods=['GET', 'POST'])
 def attempt_quiz(quiz_id):
     if session.get('username') is None:
         return redirect(url_for('user_login'))
 
-    quiz = Quiz.query.get(quiz_id)
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    # Only the version is read from the database; the quiz itself comes from the cache
+    version = db.session.query(Quiz.version).filter_by(id=quiz_id).scalar()
+    if version is None:
+        abort(404)
+    quiz = quiz_cache.get(quiz_id, version, lambda: load_quiz_payload(quiz_id))
 
     # Check if the user has already attempted this quiz
     user_id = session['user_id']
-    existing_score = Score.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
-    if existing_score:
+    if has_attempted(user_id, quiz_id) or (score_queue is not None and score_queue.is_pending(user_id, quiz_id)):
         flash('You have already attempted this quiz.', 'info')
         return redirect(url_for('upcomming_quizzes'))
 
-    if 'start_time' not in session:
-        session['start_time'] = datetime.now().isoformat()
-
     if request.method == 'POST':
-        score = 0
-        for question in questions:
-            answer_marked = request.form.get(f'question-{question.id}')
-            print(f"Question ID: {question.id}, Correct Option: {question.correct_option}, User Answer: {answer_marked}")  # Debugging
-            if answer_marked and answer_marked.strip() == str(question.correct_option).strip():
-                score += 1
-
-        # Track time taken
-        start_time = datetime.fromisoformat(session.get('start_time'))
-        end_time = datetime.now()
-        time_taken_seconds = int((end_time - start_time).total_seconds())
+        # The attempt is timed server-side from the page load; a submission without one (never started, expired,
+        # or lost in a restart) has no start time to charge, so it is not accepted
+        attempt = attempt_store.get(user_id, quiz_id)
+        if attempt is None:
+            flash('This attempt was not started or has expired, please start the quiz again.', 'error')
+            return redirect(url_for('upcomming_quizzes'))
+        now = time.time()
+        # Autosaved answers count too; once the deadline and its grace period are over, only those saved in time do
+        form = {f'question-{question_id}': str(option) for question_id, option in attempt['answers'].items()}
+        if now <= attempt['deadline'] + app.config['ATTEMPT_GRACE_SECONDS']:
+            form.update(request.form.to_dict())
+        answers = grading.read_answers(quiz['answer_key'], form)
+        score = grading.grade(quiz['answer_key'], answers)
+
+        # Track time taken, up to the deadline
+        time_taken_seconds = int(min(now, attempt['deadline']) - attempt['started_at'])
+
+        total_questions = len(quiz['answer_key'])
+        percentage = min(100, score / total_questions * 100) if total_questions else 0
+        if score_queue is not None:
+            queued = score_queue.put({
+                'user_id': user_id, 'quiz_id': quiz_id, 'subject_id': quiz['subject_id'], 'score': score,
+                'percentage': percentage, 'date_taken': datetime.utcnow().isoformat(), 'time_taken': time_taken_seconds,
+                'answers': grading.pack_answers(answers)
+            })
+            if queued != score_queue_module.FULL:
+                attempt_store.finish(user_id, quiz_id)
+                if queued == score_queue_module.DUPLICATE:
+                    flash('You have already attempted this quiz.', 'info')
+                return redirect(url_for('upcomming_quizzes'))
+            # The queue is full: apply backpressure by writing this submission directly
 
         # Save Score
         final_score = Score(
@@ -547,18 +1450,63 @@ def attempt_quiz(quiz_id):
             score=score,
             date_taken=datetime.utcnow(),
             time_taken=time_taken_seconds,
-            completed=True
+            completed=True,
+            answers=grading.pack_answers(answers)
         )
         
         db.session.add(final_score)
-        db.session.commit()
-        session.pop('start_time', None)
+        # Update the summary rollups in the same transaction as the score
+        try:
+            record_score_rollups(final_score, quiz['subject_id'], percentage)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent submission of the same quiz won the unique (user_id, quiz_id) index
+            db.session.rollback()
+            attempt_store.finish(user_id, quiz_id)
+            flash('You have already attempted this quiz.', 'info')
+            return redirect(url_for('upcomming_quizzes'))
+        attempt_store.finish(user_id, quiz_id)
+        leaderboards.record(user_id, quiz_id, quiz['subject_id'], score, time_taken_seconds)
 
-        print(f"Final Score: Quiz ID={quiz_id}, User ID={user_id}, Score={score}, Time Taken={time_taken_seconds}")  # Debugging
+        app.logger.debug("Final Score: Quiz ID=%s, User ID=%s, Score=%s, Time Taken=%s", quiz_id, user_id, score, time_taken_seconds)
 
         return redirect(url_for('upcomming_quizzes'))
 
-    return render_template('attempt_quiz.html', quiz=quiz, questions=questions, time=quiz.time_duration)
+    # The timer continues where the attempt is, and the page restores the autosaved answers
+    attempt = attempt_store.start(user_id, quiz_id, quiz['time_duration'] * 60)
+    remaining = max(0, int(attempt['deadline'] - time.time()))
+    return render_template('attempt_quiz.html', quiz=quiz, questions_html=quiz['questions_html'], remaining=remaining,
+                           saved_answers={str(question_id): option for question_id, option in attempt['answers'].items()})
+
+# Autosave: the quiz page posts each answer as it is chosen, so a reload or a lost connection keeps it
+@app.route('/Attempt-Quiz/<int:quiz_id>/Answers', methods=['POST'])
+def save_attempt_answers(quiz_id):
+    if session.get('username') is None:
+        abort(403)
+    version = db.session.query(Quiz.version).filter_by(id=quiz_id).scalar()
+    if version is None:
+        abort(404)
+    quiz = quiz_cache.get(quiz_id, version, lambda: load_quiz_payload(quiz_id))
+    user_id = session['user_id']
+    attempt = attempt_store.get(user_id, quiz_id)
+    if attempt is None:
+        return {'error': 'This quiz has not been started.'}, 409
+    if time.time() > attempt['deadline'] + app.config['ATTEMPT_GRACE_SECONDS']:
+        return {'error': 'Time is up.'}, 409
+
+    # Only options of this quiz's questions are kept
+    question_ids = set(quiz['answer_key'].question_ids.tolist())
+    answers = {}
+    for name, value in request.form.items():
+        question_id = name[len('question-'):]
+        option = grading.parse_option(value)
+        if name.startswith('question-') and question_id.isascii() and question_id.isdigit() \
+                and int(question_id) in question_ids and 1 <= option <= 4:
+            answers[int(question_id)] = option
+    attempt = attempt_store.save_answers(user_id, quiz_id, answers)
+    if attempt is None:
+        return {'error': 'This quiz has not been started.'}, 409
+    return {'saved': len(answers), 'remaining_seconds': max(0, int(attempt['deadline'] - time.time()))}
 
 @app.route('/Scorecard')
 def scorecard():
@@ -567,55 +1515,84 @@ def scorecard():
 
     search_query = request.args.get('search', '').lower()
     user_id = session['user_id']
+    # Recent attempts by default; ?history=all also reads the archived ones
+    full_history = request.args.get('history') == 'all'
+    if full_history:
+        attempt = all_attempts(user_id).subquery('attempt')
+        # Databases from before migration 5 may hold an archived and a recent attempt with the same id;
+        # (id, source) is unique, packed into one integer for the page cursors
+        page_key = attempt.c.id * 2 + attempt.c.source
+    else:
+        attempt = Score.__table__
+        page_key = attempt.c.id
+
+    # One query returns just the matching rows of this page, percentage included
+    percentage = db.case((Quiz.question_count > 0, attempt.c.score * 100 / Quiz.question_count), else_=0)
+    scores_query = db.session.query(
+        page_key.label('page_key'),
+        Subject.name.label('subject'),
+        Chapter.title.label('chapter'),
+        attempt.c.score,
+        Quiz.question_count.label('total_questions'),
+        percentage.label('percentage'),
+        attempt.c.date_taken,
+        attempt.c.time_taken
+    ).join(Quiz, attempt.c.quiz_id == Quiz.id)\
+     .join(Chapter, Quiz.chapter_id == Chapter.id)\
+     .join(Subject, Chapter.subject_id == Subject.id)\
+     .filter(attempt.c.user_id == user_id)
 
-    # Fetch scores along with total questions in each quiz
-    scores = db.session.query(Score, Quiz).join(Quiz).join(Chapter).join(Subject).filter(
-        (Score.user_id == user_id)
-    ).all()
-
-    # Prepare the modified data including percentage
-    score_data = []
-    for score, quiz in scores:
-        total_questions = len(quiz.questions)
-        if total_questions > 0:
-            percentage_score = int((score.score / total_questions) * 100)
-        else:
-            percentage_score = 0  # Avoid division by zero
-
-        score_data.append({
-            'subject': quiz.chapter.subject.name,
-            'chapter': quiz.chapter.title,
-            'score': score.score,
-            'total_questions': total_questions,
-            'percentage': percentage_score,
-            'date_taken': score.date_taken.strftime('%d/%m/%Y'),
-            'time_taken': score.time_taken
-        })
-
-    # Filter scores based on search query (subject, chapter, quiz title, or percentage)
+    # Filter scores based on search query (subject, chapter, score, total questions, or percentage)
     if search_query:
-        filtered_scores = []
-        for score in score_data:
-            # Check if the search query matches subject, chapter, or quiz title
-            if (search_query in score['subject'].lower() or
-                search_query in score['chapter'].lower() or
-                search_query in str(score['score']).lower() or
-                search_query in str(score['total_questions']).lower()):
-                filtered_scores.append(score)
-            # Check if the search query is a percentage and matches the score's percentage
-            elif search_query.endswith('%'):
-                try:
-                    # Remove the '%' and convert to integer
-                    percentage_query = int(search_query[:-1])
-                    if score['percentage'] == percentage_query:
-                        filtered_scores.append(score)
-                except ValueError:
-                    # If the search query is not a valid percentage, ignore it
-                    pass
-        score_data = filtered_scores
+        search_filters = [
+            db.func.lower(Subject.name).contains(search_query, autoescape=True),
+            db.func.lower(Chapter.title).contains(search_query, autoescape=True),
+            db.cast(attempt.c.score, db.String).contains(search_query, autoescape=True),
+            db.cast(Quiz.question_count, db.String).contains(search_query, autoescape=True)
+        ]
+        # A query like '75%' also matches that exact percentage
+        if search_query.endswith('%') and search_query[:-1].isascii() and search_query[:-1].isdigit():
+            search_filters.append(percentage == int(search_query[:-1]))
+        scores_query = scores_query.filter(db.or_(*search_filters))
+
+    page = paginate(scores_query, page_key, lambda row: row.page_key)
+    score_data = [{
+        'subject': row.subject,
+        'chapter': row.chapter,
+        'score': row.score,
+        'total_questions': row.total_questions,
+        'percentage': row.percentage,
+        'date_taken': row.date_taken.strftime('%d/%m/%Y'),
+        'time_taken': row.time_taken
+    } for row in page.items]
+
+    return render_template('scorecard.html', scores=score_data, page=page, full_history=full_history)
+
+# Overall, per-subject and per-quiz rankings with the user's own place, served from the in-memory leaderboards
+@app.route('/Leaderboard', defaults={'kind': 'overall', 'board_id': None})
+@app.route('/Leaderboard/<any(Subject, Quiz):kind>/<int:board_id>')
+def leaderboard(kind, board_id):
+    if session.get('user_id') is None:
+        return redirect(url_for('user_login'))
+
+    if kind == 'Subject':
+        board_title = db.session.query(Subject.name).filter_by(id=board_id).scalar()
+    elif kind == 'Quiz':
+        board_title = db.session.query(Quiz.title).filter_by(id=board_id).scalar()
+    else:
+        board_title = 'All Quizzes'
+    if board_title is None:
+        abort(404)
 
-    return render_template('scorecard.html', scores=score_data)
+    top, my_rank, entries = current_leaderboards().view(kind.lower(), board_id, session['user_id'], app.config['LEADERBOARD_SIZE'])
+    user_ids = [user_id for _, user_id, _, _ in top]
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    subjects = db.session.query(Subject.id, Subject.name).order_by(Subject.name).all()
+    return render_template('leaderboard.html', kind=kind, board_id=board_id, board_title=board_title, top=top,
+                           my_rank=my_rank, entries=entries, usernames=usernames, subjects=subjects)
 
 # Step 7: Run the Flask App
 if __name__ == '__main__':
+    init_database()
+    warm_leaderboards()
     app.run(debug=True)
\ No newline at end of file
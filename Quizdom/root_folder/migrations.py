@@ -0,0 +1,140 @@
+from sqlalchemy import text, inspect, LargeBinary
+
+# Schema changes made after the first release. db.create_all() builds new databases at the latest
+# version; databases created before a change are brought up to date by running its migration.
+# Every migration takes a connection (or session) and must only use SQL that works on SQLite and PostgreSQL.
+# A migration may return a short note on what it did to the data, reported along with its name.
+
+
+def add_question_count(connection):
+    columns = [column['name'] for column in inspect(connection).get_columns('quiz')]
+    if 'question_count' not in columns:
+        connection.execute(text("ALTER TABLE quiz ADD COLUMN question_count INTEGER NOT NULL DEFAULT 0"))
+    connection.execute(text(
+        "UPDATE quiz SET question_count = (SELECT COUNT(*) FROM question WHERE question.quiz_id = quiz.id)"
+    ))
+
+
+# Index names match the ones declared on the models, so new and migrated databases end up identical
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_chapter_subject_id ON chapter (subject_id)",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_chapter_id ON quiz (chapter_id)",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_date_of_quiz ON quiz (date_of_quiz)",
+    "CREATE INDEX IF NOT EXISTS ix_question_quiz_id ON question (quiz_id)",
+    "CREATE INDEX IF NOT EXISTS ix_score_quiz_id ON score (quiz_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_score_user_quiz ON score (user_id, quiz_id)"
+]
+
+
+DUPLICATE_SCORES = "SELECT * FROM score WHERE id NOT IN (SELECT MIN(id) FROM score GROUP BY user_id, quiz_id)"
+
+
+def add_lookup_indexes(connection):
+    # A user may only attempt a quiz once. Duplicate attempts (all but the first) are moved to the score_duplicate
+    # table, which nothing else reads, before the unique index is created; they can be inspected or restored from there.
+    connection.execute(text("CREATE TABLE IF NOT EXISTS score_duplicate AS SELECT * FROM score WHERE 1 = 0"))
+    moved = connection.execute(text(f"INSERT INTO score_duplicate {DUPLICATE_SCORES}")).rowcount
+    note = None
+    if moved:
+        connection.execute(text("DELETE FROM score WHERE id IN (SELECT id FROM score_duplicate)"))
+        # The rollups counted the moved attempts; emptying them makes the upgrade (main.upgrade_schema) rebuild them
+        connection.execute(text("DELETE FROM subject_stats"))
+        connection.execute(text("DELETE FROM user_subject_stats"))
+        note = f"moved {moved} duplicate attempts to score_duplicate"
+    for statement in INDEXES:
+        connection.execute(text(statement))
+    return note
+
+
+def add_quiz_version(connection):
+    columns = [column['name'] for column in inspect(connection).get_columns('quiz')]
+    if 'version' not in columns:
+        connection.execute(text("ALTER TABLE quiz ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+
+
+def add_score_answers(connection):
+    columns = [column['name'] for column in inspect(connection).get_columns('score')]
+    if 'answers' not in columns:
+        # BLOB on SQLite, BYTEA on PostgreSQL
+        blob_type = LargeBinary().compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE score ADD COLUMN answers {blob_type}"))
+
+
+SCORE_COLUMNS = "user_id, quiz_id, score, date_taken, time_taken, completed, answers"
+SCORE_TABLE = """CREATE TABLE score_autoincrement (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES user (id),
+    quiz_id INTEGER NOT NULL REFERENCES quiz (id),
+    score INTEGER NOT NULL,
+    date_taken DATETIME,
+    time_taken INTEGER NOT NULL,
+    completed BOOLEAN,
+    answers BLOB
+)"""
+
+
+def stop_score_id_reuse(connection):
+    # Without AUTOINCREMENT SQLite hands the ids of the newest rows out again once they are archived, and the
+    # archive keeps the ids. PostgreSQL sequences never reuse an id.
+    if connection.dialect.name != 'sqlite':
+        return
+    table_sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'score'")).scalar()
+    if 'AUTOINCREMENT' in table_sql.upper():
+        return
+    archived = "SELECT id FROM score_archive" if inspect(connection).has_table('score_archive') else "SELECT NULL WHERE 0"
+    connection.execute(text(SCORE_TABLE))
+    connection.execute(text(
+        f"INSERT INTO score_autoincrement (id, {SCORE_COLUMNS}) SELECT id, {SCORE_COLUMNS} FROM score WHERE id NOT IN ({archived})"
+    ))
+    # Continue after the highest id ever given out, archived ones included
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'score_autoincrement'"))
+    connection.execute(text(
+        f"INSERT INTO sqlite_sequence (name, seq) SELECT 'score_autoincrement', MAX(id) FROM (SELECT id FROM score UNION ALL {archived})"
+    ))
+    # Attempts that already reused an archived id get a new one
+    connection.execute(text(
+        f"INSERT INTO score_autoincrement ({SCORE_COLUMNS}) SELECT {SCORE_COLUMNS} FROM score WHERE id IN ({archived}) ORDER BY id"
+    ))
+    connection.execute(text("DROP TABLE score"))
+    connection.execute(text("ALTER TABLE score_autoincrement RENAME TO score"))
+    for statement in INDEXES:
+        if ' ON score ' in statement:
+            connection.execute(text(statement))
+
+
+MIGRATIONS = [
+    (1, 'Add quiz.question_count', add_question_count),
+    (2, 'Index foreign keys and lookup columns, one attempt per user and quiz', add_lookup_indexes),
+    (3, 'Add quiz.version', add_quiz_version),
+    (4, 'Add score.answers', add_score_answers),
+    (5, 'Never reuse score ids', stop_score_id_reuse)
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def ensure_version_table(connection):
+    connection.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+
+
+def current_version(connection):
+    ensure_version_table(connection)
+    version = connection.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def set_version(connection, version):
+    ensure_version_table(connection)
+    connection.execute(text("DELETE FROM schema_version"))
+    connection.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {'version': version})
+
+
+# Run the migrations newer than the database; returns the names of those that ran, with their notes. The caller commits.
+def upgrade(connection):
+    version = current_version(connection)
+    applied = []
+    for migration_version, name, migrate in MIGRATIONS:
+        if migration_version > version:
+            note = migrate(connection)
+            set_version(connection, migration_version)
+            applied.append(f"{name} ({note})" if note else name)
+    return applied
@@ -0,0 +1,61 @@
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+# Read the cursor and page size from the query string, keeping the size within limits
+def page_args(args, default_size, max_size):
+    per_page = args.get('per_page', default_size, type=int)
+    return {
+        'after': args.get('after', type=int),
+        'before': args.get('before', type=int),
+        'per_page': min(max(per_page, 1), max_size)
+    }
+
+
+# Seek pagination on a unique, increasing key column: each page starts right after (or before)
+# the key of the last row shown, so the cost does not depend on how deep the page is
+def keyset_paginate(query, key_column, key, after=None, before=None, per_page=20):
+    backwards = before is not None
+    if backwards:
+        query = query.filter(key_column < before).order_by(key_column.desc())
+    else:
+        if after is not None:
+            query = query.filter(key_column > after)
+        query = query.order_by(key_column)
+    # One extra row tells whether there is another page
+    rows = query.limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        # Coming back from a later page, so there is always a next page
+        prev_cursor = key(rows[0]) if has_more and rows else None
+        next_cursor = key(rows[-1]) if rows else None
+    else:
+        next_cursor = key(rows[-1]) if has_more else None
+        prev_cursor = key(rows[0]) if after is not None and rows else None
+    return KeysetPage(rows, next_cursor, prev_cursor, per_page)
+
+# Pages through ids that are already ranked (e.g. search results); the cursors are row ids as for keyset pages
+def ranked_paginate(ranked_ids, load, key, after=None, before=None, per_page=20):
+    position = {row_id: index for index, row_id in enumerate(ranked_ids)}
+    if before in position:
+        end = position[before]
+        start = max(0, end - per_page)
+    else:
+        start = position[after] + 1 if after in position else 0
+        end = start + per_page
+    page_ids = ranked_ids[start:end]
+    rows = {key(row): row for row in load(page_ids)} if page_ids else {}
+    items = [rows[row_id] for row_id in page_ids if row_id in rows]
+    next_cursor = page_ids[-1] if page_ids and end < len(ranked_ids) else None
+    prev_cursor = page_ids[0] if page_ids and start > 0 else None
+    return KeysetPage(items, next_cursor, prev_cursor, per_page)
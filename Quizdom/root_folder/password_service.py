@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+from process_pool import BoundedPool
+
+
+class HasherBusy(Exception):
+    pass
+
+
+# The method and parameters Werkzeug writes in front of a hash, e.g. 'scrypt' -> 'scrypt:32768:8:1'
+@lru_cache(maxsize=8)
+def full_method(method):
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+# Run in a pool process
+def hash_password(password, method):
+    return generate_password_hash(password, method)
+
+
+# (matches, new_hash): a matching hash made with other parameters than method is re-hashed in the same call
+def verify_password(password_hash, password, method):
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if password_hash.split('$', 1)[0] == full_method(method):
+        return True, None
+    return True, generate_password_hash(password, method)
+
+
+# Hashes and checks passwords in a pool of processes, so a burst of logins spreads over every core instead of
+# holding the request workers. At most max_pending hashes are queued or running; beyond that, and when a hash
+# takes longer than timeout seconds, HasherBusy is raised so the page can answer "try again" right away.
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=2, max_pending=64, timeout=5):
+        self.method = method
+        # 0 workers hashes in the calling thread, for development and tests
+        self.pool = BoundedPool(workers, max_pending)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.counters = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0, 'timeouts': 0}
+
+    def run(self, function, *arguments):
+        future = self.pool.submit(function, *arguments)
+        if future is None:
+            with self.lock:
+                self.counters['rejected'] += 1
+            raise HasherBusy()
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self.lock:
+                self.counters['timeouts'] += 1
+            raise HasherBusy()
+
+    def hash(self, password):
+        password_hash = self.run(hash_password, password, self.method)
+        with self.lock:
+            self.counters['hashed'] += 1
+        return password_hash
+
+    # (matches, new_hash); new_hash is set when the stored hash should be replaced by one with the current parameters
+    def verify(self, password_hash, password):
+        matches, new_hash = self.run(verify_password, password_hash, password, self.method)
+        with self.lock:
+            self.counters['verified'] += 1
+            if new_hash is not None:
+                self.counters['rehashed'] += 1
+        return matches, new_hash
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, method=self.method)
+
+    def shutdown(self):
+        self.pool.shutdown()
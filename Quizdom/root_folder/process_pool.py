@@ -0,0 +1,57 @@
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def run_inline(function, *arguments):
+    future = Future()
+    try:
+        future.set_result(function(*arguments))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+# A process pool that holds at most max_pending jobs, queued or running. The services that offload CPU-bound
+# work from the request workers (chart rendering, password hashing) submit through it and turn a full pool
+# into their own "try again" answer instead of queueing. The processes are started on first use.
+class BoundedPool:
+    def __init__(self, workers=2, max_pending=16):
+        # 0 workers runs jobs in the calling thread, for development and tests
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor = None
+
+    def get_executor(self):
+        if self.executor is None:
+            # Spawned processes start clean instead of inheriting the app's threads and database connections
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def start(self, function, *arguments):
+        if not self.workers:
+            return run_inline(function, *arguments)
+        try:
+            return self.get_executor().submit(function, *arguments)
+        except BrokenProcessPool:
+            # A pool process died (e.g. killed for memory); start a fresh pool
+            self.executor = None
+            return self.get_executor().submit(function, *arguments)
+
+    # The future of function(*arguments) run in the pool, or None when max_pending jobs are already in it
+    def submit(self, function, *arguments):
+        if not self.slots.acquire(blocking=False):
+            return None
+        try:
+            future = self.start(function, *arguments)
+        except Exception:
+            self.slots.release()
+            raise
+        # The slot is only freed once the job is over, even if the request waiting for it gave up
+        future.add_done_callback(lambda done: self.slots.release())
+        return future
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,261 @@
+import csv
+import io
+import json
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import text, bindparam, DateTime
+
+# Columns of an import/export file. Subjects, chapters and quizzes are matched by name (and created when
+# missing); every row adds one question. The quiz_* columns are only used when a quiz has to be created.
+COLUMNS = ['subject', 'chapter', 'quiz', 'question_text', 'option1', 'option2', 'option3', 'option4', 'correct_option',
+           'quiz_date', 'quiz_time_duration', 'quiz_remarks']
+REQUIRED_COLUMNS = COLUMNS[:9]
+# Matches the String(100) columns of the models
+MAX_LENGTHS = {'subject': 100, 'chapter': 100, 'quiz': 100, 'option1': 100, 'option2': 100, 'option3': 100, 'option4': 100}
+DEFAULT_TIME_DURATION = 30
+# A JSON row that is still incomplete after this many characters is treated as malformed
+MAX_JSON_OBJECT_SIZE = 1024 * 1024
+
+FORMATS = {'.csv': 'csv', '.json': 'json', '.jsonl': 'jsonl'}
+MIMETYPES = {'csv': 'text/csv', 'json': 'application/json', 'jsonl': 'application/x-ndjson'}
+
+INSERT_QUESTION = text(
+    "INSERT INTO question (quiz_id, question_text, option1, option2, option3, option4, correct_option) "
+    "VALUES (:quiz_id, :question_text, :option1, :option2, :option3, :option4, :correct_option)"
+)
+# Keeps Quiz.question_count right and makes every worker's cached copy of the quiz stale
+UPDATE_QUIZ = text("UPDATE quiz SET question_count = question_count + :added, version = version + 1 WHERE id = :id")
+
+
+class RowError(ValueError):
+    def __init__(self, number, message):
+        super().__init__(f"Row {number}: {message}")
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+        self.created = Counter()
+        self.quiz_ids = set()
+
+
+def detect_format(filename):
+    for extension, file_format in FORMATS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    return None
+
+
+# Yield (row number, row) from a text stream without reading the whole file into memory
+def iter_rows(stream, file_format):
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise RowError(1, f"missing columns {', '.join(missing)}")
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        yield from iter_json(stream)
+
+
+# Objects of a JSON array, or of a file with one object per line, decoded one chunk at a time
+def iter_json(stream, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    number = 0
+    end_of_file = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position == len(buffer):
+            if end_of_file:
+                return
+            buffer, position = stream.read(chunk_size), 0
+            end_of_file = not buffer
+            continue
+        try:
+            value, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The object is cut off at the end of the chunk; read more and decode it again
+            if end_of_file or len(buffer) - position > MAX_JSON_OBJECT_SIZE:
+                raise RowError(number + 1, "invalid JSON")
+            more = stream.read(chunk_size)
+            end_of_file = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+        number += 1
+        yield number, value
+
+
+def validate_row(number, row):
+    if not isinstance(row, dict):
+        raise RowError(number, "expected an object")
+    values = {column: str(row.get(column) if row.get(column) is not None else '').strip() for column in COLUMNS}
+    for column in REQUIRED_COLUMNS:
+        if not values[column]:
+            raise RowError(number, f"{column} is empty")
+    for column, max_length in MAX_LENGTHS.items():
+        if len(values[column]) > max_length:
+            raise RowError(number, f"{column} is longer than {max_length} characters")
+    if values['correct_option'] not in ('1', '2', '3', '4'):
+        raise RowError(number, "correct_option must be 1, 2, 3 or 4")
+    values['correct_option'] = int(values['correct_option'])
+    try:
+        values['quiz_date'] = datetime.strptime(values['quiz_date'], '%Y-%m-%d') if values['quiz_date'] else None
+    except ValueError:
+        raise RowError(number, "quiz_date must be YYYY-MM-DD")
+    # isdigit() alone also accepts digits such as '²', which int() rejects
+    if values['quiz_time_duration'] and not (values['quiz_time_duration'].isascii() and values['quiz_time_duration'].isdigit()):
+        raise RowError(number, "quiz_time_duration must be a number of minutes")
+    values['quiz_time_duration'] = int(values['quiz_time_duration'] or DEFAULT_TIME_DURATION)
+    return values
+
+
+# (find, create) statements for the parents of a question, looked up by name within their own parent
+PARENT_QUERIES = {
+    'subject': (
+        text("SELECT MIN(id) FROM subject WHERE name = :name"),
+        text("INSERT INTO subject (name, description) VALUES (:name, '') RETURNING id")
+    ),
+    'chapter': (
+        text("SELECT MIN(id) FROM chapter WHERE subject_id = :subject_id AND title = :title"),
+        text("INSERT INTO chapter (title, description, subject_id) VALUES (:title, '', :subject_id) RETURNING id")
+    ),
+    'quiz': (
+        text("SELECT MIN(id) FROM quiz WHERE chapter_id = :chapter_id AND title = :title"),
+        text("INSERT INTO quiz (title, chapter_id, date_of_quiz, time_duration, remarks, question_count, version) "
+             "VALUES (:title, :chapter_id, :date_of_quiz, :time_duration, :remarks, 0, 0) RETURNING id")
+        .bindparams(bindparam('date_of_quiz', type_=DateTime))
+    )
+}
+
+
+# Resolves subject, chapter and quiz names to ids, remembering them for the rest of the import
+class ParentLookup:
+    def __init__(self, session, create_missing, result):
+        self.session = session
+        self.create_missing = create_missing
+        self.result = result
+        self.ids = {}
+
+    def find_or_create(self, number, kind, key, parameters):
+        if key not in self.ids:
+            find, create = PARENT_QUERIES[kind]
+            found = self.session.execute(find, parameters).scalar()
+            if found is None:
+                if not self.create_missing:
+                    raise RowError(number, f"{kind} '{key[-1]}' does not exist")
+                found = self.session.execute(create, parameters).scalar()
+                self.result.created[kind] += 1
+            self.ids[key] = found
+        return self.ids[key]
+
+    def quiz_id(self, number, row):
+        subject_id = self.find_or_create(number, 'subject', ('subject', row['subject']), {'name': row['subject']})
+        chapter_id = self.find_or_create(number, 'chapter', ('chapter', subject_id, row['chapter']),
+                                         {'subject_id': subject_id, 'title': row['chapter']})
+        return self.find_or_create(number, 'quiz', ('quiz', chapter_id, row['quiz']), {
+            'chapter_id': chapter_id, 'title': row['quiz'], 'date_of_quiz': row['quiz_date'] or datetime.utcnow(),
+            'time_duration': row['quiz_time_duration'], 'remarks': row['quiz_remarks']
+        })
+
+
+# Insert the questions of an import in batches, one executemany and one commit per batch.
+# Invalid rows are skipped and reported; a file that cannot be parsed stops the import after the last full row.
+# before_commit, if given, is called with the ids of the quizzes a batch added to, inside that batch's transaction.
+def import_questions(session, rows, batch_size=1000, create_missing=True, max_errors=100, before_commit=None):
+    result = ImportResult()
+    lookup = ParentLookup(session, create_missing, result)
+    batch = []
+    added = Counter()
+
+    def flush():
+        if batch:
+            session.execute(INSERT_QUESTION, batch)
+            session.execute(UPDATE_QUIZ, [{'id': quiz_id, 'added': count} for quiz_id, count in added.items()])
+            if before_commit is not None:
+                before_commit(set(added))
+        session.commit()
+        result.imported += len(batch)
+        result.quiz_ids.update(added)
+        batch.clear()
+        added.clear()
+
+    def reject(error):
+        result.skipped += 1
+        if len(result.errors) < max_errors:
+            result.errors.append(str(error))
+
+    try:
+        for number, raw_row in rows:
+            try:
+                row = validate_row(number, raw_row)
+                quiz_id = lookup.quiz_id(number, row)
+            except RowError as error:
+                reject(error)
+                continue
+            batch.append({'quiz_id': quiz_id, 'question_text': row['question_text'], 'option1': row['option1'],
+                          'option2': row['option2'], 'option3': row['option3'], 'option4': row['option4'],
+                          'correct_option': row['correct_option']})
+            added[quiz_id] += 1
+            if len(batch) >= batch_size:
+                flush()
+    except (RowError, csv.Error, UnicodeDecodeError) as error:
+        reject(error)
+    flush()
+    return result
+
+
+EXPORT_QUERY = text(
+    "SELECT question.id, subject.name, chapter.title, quiz.title, question.question_text, question.option1, "
+    "question.option2, question.option3, question.option4, question.correct_option, quiz.date_of_quiz, "
+    "quiz.time_duration, quiz.remarks FROM question "
+    "JOIN quiz ON question.quiz_id = quiz.id JOIN chapter ON quiz.chapter_id = chapter.id "
+    "JOIN subject ON chapter.subject_id = subject.id "
+    "WHERE question.id > :after ORDER BY question.id LIMIT :limit"
+).columns(date_of_quiz=DateTime)
+
+
+# Every question, fetched a keyset page at a time, as rows in the import column order
+def iter_export_rows(session, batch_size=1000):
+    after = 0
+    while True:
+        rows = session.execute(EXPORT_QUERY, {'after': after, 'limit': batch_size}).all()
+        for row in rows:
+            yield list(row[1:10]) + [row[10].strftime('%Y-%m-%d') if row[10] else '', row[11], row[12]]
+        if len(rows) < batch_size:
+            return
+        after = rows[-1][0]
+
+
+# The export as text chunks, one per batch, ready to be streamed to a response or a file
+def export_questions(session, file_format, batch_size=1000):
+    rows = iter_export_rows(session, batch_size)
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        # A JSON array, or one object per line for jsonl
+        array = file_format == 'json'
+        chunk = ['['] if array else []
+        for count, row in enumerate(rows):
+            line = json.dumps(dict(zip(COLUMNS, row)))
+            chunk.append((('\n' if count == 0 else ',\n') + line) if array else line + '\n')
+            if len(chunk) >= batch_size:
+                yield ''.join(chunk)
+                chunk = []
+        if array:
+            chunk.append('\n]\n')
+        yield ''.join(chunk)
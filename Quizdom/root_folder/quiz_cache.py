@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+
+
+# In-process LRU cache of everything attempt_quiz needs for a quiz (details, answer key, rendered questions),
+# also used for the rendered cards of the management pages.
+# Entries are tagged with the quiz's version, which the admin routes bump on every change, so a stale
+# payload is simply a miss. Only one request per quiz loads a missing payload; the others wait for it.
+class QuizCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, quiz_id, version):
+        with self.lock:
+            entry = self.entries.get(quiz_id)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(quiz_id)
+                self.hits += 1
+                return entry[1]
+            return None
+
+    def get(self, quiz_id, version, load):
+        payload = self.lookup(quiz_id, version)
+        if payload is not None:
+            return payload
+        with self.lock:
+            load_lock = self.loading.setdefault(quiz_id, threading.Lock())
+        with load_lock:
+            # Another request may have loaded it while this one waited
+            payload = self.lookup(quiz_id, version)
+            if payload is not None:
+                return payload
+            payload = load()
+            with self.lock:
+                self.misses += 1
+                self.entries[quiz_id] = (version, payload)
+                self.entries.move_to_end(quiz_id)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                self.loading.pop(quiz_id, None)
+            return payload
+
+    def invalidate(self, quiz_id):
+        with self.lock:
+            self.entries.pop(quiz_id, None)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Write-behind queue for quiz submissions. A submission is appended to a local SQLite file in WAL mode
+# (durable once put() returns) and a background thread moves pending submissions into the Score table
+# in batches, so a burst of submissions costs one write transaction per batch instead of one each.
+# The (user_id, quiz_id) primary key makes the duplicate check for queued attempts atomic, also across
+# worker processes sharing the file; the flush callback checks against attempts already in Score.
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS pending_score (user_id INTEGER NOT NULL, quiz_id INTEGER NOT NULL, "
+    "subject_id INTEGER NOT NULL, score INTEGER NOT NULL, percentage REAL NOT NULL, date_taken TEXT NOT NULL, "
+    "time_taken INTEGER NOT NULL, answers BLOB, enqueued_at REAL NOT NULL, claimed_by TEXT, claimed_at REAL, "
+    "PRIMARY KEY (user_id, quiz_id))",
+    "CREATE INDEX IF NOT EXISTS ix_pending_score_enqueued_at ON pending_score (enqueued_at)"
+]
+COLUMNS = ['user_id', 'quiz_id', 'subject_id', 'score', 'percentage', 'date_taken', 'time_taken', 'answers']
+
+QUEUED = 'queued'
+DUPLICATE = 'duplicate'
+FULL = 'full'
+
+
+class ScoreQueue:
+    def __init__(self, path, flush, batch_size=500, interval=0.5, max_pending=10000, claim_timeout=60):
+        self.path = path
+        self.flush = flush
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        # Rows claimed by a flusher that died are handed out again after this many seconds
+        self.claim_timeout = claim_timeout
+        self.owner = uuid.uuid4().hex
+        self.local = threading.local()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.counters = {'enqueued': 0, 'flushed': 0, 'duplicates': 0, 'rejected': 0, 'batches': 0, 'errors': 0}
+        self.last_flush = {'rows': 0, 'seconds': 0.0, 'at': None}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self.connection()
+        for statement in SCHEMA:
+            connection.execute(statement)
+
+    # One connection per thread; autocommit, with explicit BEGIN IMMEDIATE where reads and writes must be atomic
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            self.local.connection = connection
+        return connection
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    # Append a submission; returns QUEUED, DUPLICATE when one is already pending, or FULL when the queue is at max_pending
+    def put(self, submission):
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            pending = connection.execute("SELECT COUNT(*) FROM pending_score").fetchone()[0]
+            if pending >= self.max_pending:
+                connection.execute("ROLLBACK")
+                self.count('rejected')
+                return FULL
+            inserted = connection.execute(
+                f"INSERT OR IGNORE INTO pending_score ({', '.join(COLUMNS)}, enqueued_at) VALUES ({', '.join('?' * len(COLUMNS))}, ?)",
+                [submission[column] for column in COLUMNS] + [time.time()]
+            ).rowcount
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        if not inserted:
+            return DUPLICATE
+        self.count('enqueued')
+        if pending + 1 >= self.batch_size:
+            self.wakeup.set()
+        return QUEUED
+
+    def is_pending(self, user_id, quiz_id):
+        row = self.connection().execute(
+            "SELECT 1 FROM pending_score WHERE user_id = ? AND quiz_id = ?", (user_id, quiz_id)
+        ).fetchone()
+        return row is not None
+
+    def pending_quiz_ids(self, user_id):
+        rows = self.connection().execute("SELECT quiz_id FROM pending_score WHERE user_id = ?", (user_id,))
+        return {row[0] for row in rows}
+
+    # Claim the oldest unclaimed batch so that concurrent flushers never write the same submission twice
+    def claim(self):
+        connection = self.connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE pending_score SET claimed_by = ?, claimed_at = ? WHERE rowid IN ("
+                "SELECT rowid FROM pending_score WHERE claimed_by IS NULL OR claimed_at < ? ORDER BY enqueued_at LIMIT ?)",
+                (self.owner, now, now - self.claim_timeout, self.batch_size)
+            )
+            rows = connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM pending_score WHERE claimed_by = ? ORDER BY enqueued_at", (self.owner,)
+            ).fetchall()
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    # Move one batch into the database; returns the number of submissions handled
+    def flush_once(self):
+        submissions = self.claim()
+        if not submissions:
+            return 0
+        started = time.perf_counter()
+        try:
+            duplicates = self.flush(submissions)
+        except Exception:
+            # Release the batch so the next round retries it
+            self.connection().execute("UPDATE pending_score SET claimed_by = NULL WHERE claimed_by = ?", (self.owner,))
+            self.count('errors')
+            raise
+        # Once the scores are committed the queue rows can go; a crash in between only means the batch is
+        # flushed again, and the flush callback skips attempts that are already stored
+        self.connection().execute("DELETE FROM pending_score WHERE claimed_by = ?", (self.owner,))
+        with self.lock:
+            self.counters['flushed'] += len(submissions) - duplicates
+            self.counters['duplicates'] += duplicates
+            self.counters['batches'] += 1
+            self.last_flush = {'rows': len(submissions), 'seconds': time.perf_counter() - started, 'at': time.time()}
+        return len(submissions)
+
+    def drain(self):
+        while self.flush_once():
+            pass
+
+    def run(self, on_error):
+        while not self.stopping.is_set():
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.drain()
+            except Exception as error:
+                on_error(error)
+                self.stopping.wait(self.interval)
+
+    def start(self, on_error=lambda error: None):
+        self.thread = threading.Thread(target=self.run, args=(on_error,), name='score-queue', daemon=True)
+        self.thread.start()
+
+    # Stop the worker and flush whatever is still pending
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.drain()
+
+    def stats(self):
+        pending, oldest = self.connection().execute("SELECT COUNT(*), MIN(enqueued_at) FROM pending_score").fetchone()
+        with self.lock:
+            stats = dict(self.counters)
+            stats.update(
+                pending=pending,
+                max_pending=self.max_pending,
+                # Backpressure: how full the queue is and how long the oldest submission has waited
+                fill_ratio=pending / self.max_pending if self.max_pending else 0,
+                oldest_pending_seconds=time.time() - oldest if oldest else 0,
+                last_flush_rows=self.last_flush['rows'],
+                last_flush_seconds=self.last_flush['seconds']
+            )
+        return stats
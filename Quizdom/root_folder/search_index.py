@@ -0,0 +1,100 @@
+import re
+from sqlalchemy import text
+
+# Columns indexed for each table; every table gets an external-content FTS5 table named <table>_fts
+SEARCH_COLUMNS = {
+    'subject': ['name', 'description'],
+    'chapter': ['title', 'description'],
+    'quiz': ['title', 'remarks'],
+    'question': ['question_text', 'option1', 'option2', 'option3', 'option4'],
+    'user': ['username', 'email', 'fullname']
+}
+
+# Each search returns (id, rank) rows, rank being FTS5's bm25 score; a quiz also matches through its chapter,
+# subject or questions. The MATCH runs in its own ordered subquery because bm25 cannot be evaluated inside a join.
+SEARCH_QUERIES = {
+    'subject': ["SELECT rowid AS id, rank FROM subject_fts WHERE subject_fts MATCH :match"],
+    'user': ["SELECT rowid AS id, rank FROM user_fts WHERE user_fts MATCH :match"],
+    'quiz': [
+        "SELECT rowid AS id, rank FROM quiz_fts WHERE quiz_fts MATCH :match",
+        "SELECT quiz.id AS id, matches.rank FROM (SELECT rowid, rank FROM chapter_fts WHERE chapter_fts MATCH :match ORDER BY rank) AS matches "
+        "JOIN quiz ON quiz.chapter_id = matches.rowid",
+        "SELECT quiz.id AS id, matches.rank FROM (SELECT rowid, rank FROM subject_fts WHERE subject_fts MATCH :match ORDER BY rank) AS matches "
+        "JOIN chapter ON chapter.subject_id = matches.rowid JOIN quiz ON quiz.chapter_id = chapter.id"
+    ],
+    'question': [
+        "SELECT question.quiz_id AS id, matches.rank FROM (SELECT rowid, rank FROM question_fts WHERE question_fts MATCH :match ORDER BY rank) AS matches "
+        "JOIN question ON question.id = matches.rowid"
+    ]
+}
+
+
+def fts5_available(session):
+    try:
+        session.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(body)"))
+        session.execute(text("DROP TABLE temp.fts5_probe"))
+        return True
+    except Exception:
+        session.rollback()
+        return False
+
+
+def index_triggers(table, columns):
+    quoted_table = f'"{table}"'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    delete_old = f"INSERT INTO {table}_fts({table}_fts, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {table}_fts(rowid, {column_list}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {quoted_table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {quoted_table} BEGIN {delete_old} END",
+        # Only re-index when an indexed column changes, not on e.g. quiz.question_count updates
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {column_list} ON {quoted_table} BEGIN {delete_old} {insert_new} END"
+    ]
+
+
+# Create the FTS5 tables and the triggers that keep them in sync; returns False when FTS5 is missing
+def create_search_index(session):
+    if not fts5_available(session):
+        return False
+    for table, columns in SEARCH_COLUMNS.items():
+        exists = session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': f'{table}_fts'}).first()
+        if not exists:
+            session.execute(text(
+                f"CREATE VIRTUAL TABLE {table}_fts USING fts5({', '.join(columns)}, "
+                f"content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            ))
+            # Index the rows that were written before the index existed
+            session.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+        for trigger in index_triggers(table, columns):
+            session.execute(text(trigger))
+    return True
+
+
+def index_exists(session):
+    return session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quiz_fts'")).first() is not None
+
+
+def rebuild_search_index(session):
+    for table in SEARCH_COLUMNS:
+        session.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+
+
+# Turn free text into an FTS5 query where every word must match as a prefix, e.g. "alg eq" -> "alg"* "eq"*
+def match_expression(search_query):
+    words = re.findall(r'\w+', search_query.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+# Ids of matching rows, best match first; kinds are combined, so 'quiz' + 'question' finds quizzes by question text too
+def search_ids(session, kinds, search_query, limit):
+    match = match_expression(search_query)
+    if not match:
+        return []
+    sources = ' UNION ALL '.join(sql for kind in kinds for sql in SEARCH_QUERIES[kind])
+    rows = session.execute(
+        text(f"SELECT id, MIN(rank) AS best FROM ({sources}) GROUP BY id ORDER BY best, id LIMIT :limit"),
+        {'match': match, 'limit': limit}
+    )
+    return [row.id for row in rows]
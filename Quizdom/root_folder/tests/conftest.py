@@ -0,0 +1,18 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# The app on a temporary database, shared by every test; password hashing runs inline
+@pytest.fixture(scope='session')
+def main(tmp_path_factory):
+    # main binds to its database when it is imported
+    os.environ['QUIZDOM_DATABASE_URL'] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'tests.db'}"
+    sys.path.insert(0, ROOT)
+    import main
+    from password_service import PasswordHasher
+    main.password_hasher = PasswordHasher(main.app.config['PASSWORD_HASH_METHOD'], 0)
+    main.init_database()
+    return main
@@ -0,0 +1,47 @@
+# A submission is timed from the attempt the quiz page started
+from datetime import datetime
+import pytest
+
+
+@pytest.fixture(scope='module')
+def attempt(main):
+    db = main.db
+    user = main.User(username='attempting', email='attempting@example.com', fullname='Attempting User',
+                     qualification='Test', dob=datetime(2000, 1, 1).date())
+    user.set_password('attempting')
+    subject = main.Subject(name='Attempted subject', description='')
+    chapter = main.Chapter(title='Attempted chapter', description='', subject=subject)
+    quizzes = [main.Quiz(title=f'Attempted quiz {number}', chapter=chapter, date_of_quiz=datetime(2025, 1, 1),
+                         time_duration=30, remarks='', question_count=1) for number in range(2)]
+    questions = [main.Question(quiz=quiz, question_text='Question', option1='a', option2='b', option3='c', option4='d',
+                               correct_option=1) for quiz in quizzes]
+    db.session.add_all([user, subject, chapter, *quizzes, *questions])
+    db.session.commit()
+    client = main.app.test_client()
+    assert client.post('/User-Login', data={'username_or_email': 'attempting', 'password': 'attempting'}).status_code == 302
+    return client, user.id, [(quiz.id, question.id) for quiz, question in zip(quizzes, questions)]
+
+
+def scores(main, user_id, quiz_id):
+    return main.Score.query.filter_by(user_id=user_id, quiz_id=quiz_id).all()
+
+
+def test_submission_without_started_attempt_is_rejected(main, attempt):
+    client, user_id, quizzes = attempt
+    quiz_id, question_id = quizzes[0]
+    assert client.post(f'/Attempt-Quiz/{quiz_id}', data={f'question-{question_id}': '1'}).status_code == 302
+    assert scores(main, user_id, quiz_id) == []
+
+    assert client.get(f'/Attempt-Quiz/{quiz_id}').status_code == 200
+    client.post(f'/Attempt-Quiz/{quiz_id}', data={f'question-{question_id}': '1'})
+    assert [score.score for score in scores(main, user_id, quiz_id)] == [1]
+
+
+def test_autosave_ignores_non_ascii_question_ids(main, attempt):
+    client, user_id, quizzes = attempt
+    quiz_id, question_id = quizzes[1]
+    assert client.post(f'/Attempt-Quiz/{quiz_id}/Answers', data={f'question-{question_id}': '1'}).status_code == 409
+    client.get(f'/Attempt-Quiz/{quiz_id}')
+    response = client.post(f'/Attempt-Quiz/{quiz_id}/Answers', data={'question-²': '1', f'question-{question_id}': '2'})
+    assert response.status_code == 200
+    assert response.get_json()['saved'] == 1
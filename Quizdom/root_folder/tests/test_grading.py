@@ -0,0 +1,23 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import grading
+
+
+def test_parse_option_accepts_ascii_digits():
+    assert grading.parse_option('3') == 3
+    assert grading.parse_option(' 4 ') == 4
+
+
+def test_parse_option_rejects_everything_else():
+    for value in (None, '', 'a', '-1', '1.5', '256', '²', '٣', '３'):
+        assert grading.parse_option(value) == 0, value
+
+
+def test_read_answers_with_non_ascii_digits():
+    key = grading.AnswerKey([7, 5], [1, 2])
+    answers = grading.read_answers(key, {'question-5': '²', 'question-7': '1'})
+    assert answers['option'].tolist() == [0, 1]
+    assert grading.grade(key, answers) == 1
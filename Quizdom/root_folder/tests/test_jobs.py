@@ -0,0 +1,20 @@
+# Background jobs started in every worker run in only one of them
+from datetime import datetime, timedelta
+
+
+def test_one_holder_per_job(main):
+    assert main.claim_job('counted-job', 60, holder='worker-1')
+    assert not main.claim_job('counted-job', 60, holder='worker-2')
+    # The holder renews its lease
+    assert main.claim_job('counted-job', 60, holder='worker-1')
+    assert not main.claim_job('counted-job', 60, holder='worker-2')
+    # Another job has its own lease
+    assert main.claim_job('other-job', 60, holder='worker-2')
+
+
+def test_expired_lease_is_taken_over(main):
+    assert main.claim_job('stopped-job', 60, holder='worker-1')
+    main.db.session.get(main.JobLease, 'stopped-job').expires_at = datetime.utcnow() - timedelta(seconds=1)
+    main.db.session.commit()
+    assert main.claim_job('stopped-job', 60, holder='worker-2')
+    assert not main.claim_job('stopped-job', 60, holder='worker-1')
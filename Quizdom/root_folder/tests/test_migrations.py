@@ -0,0 +1,45 @@
+import os
+import sys
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import migrations
+
+TABLES = [
+    "CREATE TABLE chapter (id INTEGER PRIMARY KEY, subject_id INTEGER)",
+    "CREATE TABLE quiz (id INTEGER PRIMARY KEY, chapter_id INTEGER, date_of_quiz DATETIME)",
+    "CREATE TABLE question (id INTEGER PRIMARY KEY, quiz_id INTEGER)",
+    "CREATE TABLE score (id INTEGER PRIMARY KEY, user_id INTEGER, quiz_id INTEGER, score INTEGER)",
+    "CREATE TABLE subject_stats (subject_id INTEGER PRIMARY KEY)",
+    "CREATE TABLE user_subject_stats (user_id INTEGER, subject_id INTEGER)"
+]
+
+
+def database(scores):
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        for statement in TABLES:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO score (id, user_id, quiz_id, score) VALUES (:id, :user_id, :quiz_id, :score)"), scores)
+        connection.execute(text("INSERT INTO subject_stats (subject_id) VALUES (1)"))
+    return engine
+
+
+def test_duplicate_attempts_are_moved_not_deleted():
+    engine = database([{'id': 1, 'user_id': 1, 'quiz_id': 1, 'score': 2}, {'id': 2, 'user_id': 1, 'quiz_id': 1, 'score': 5},
+                       {'id': 3, 'user_id': 2, 'quiz_id': 1, 'score': 1}, {'id': 4, 'user_id': 1, 'quiz_id': 1, 'score': 0}])
+    with engine.begin() as connection:
+        assert migrations.add_lookup_indexes(connection) == "moved 2 duplicate attempts to score_duplicate"
+        assert connection.execute(text("SELECT id FROM score ORDER BY id")).scalars().all() == [1, 3]
+        assert connection.execute(text("SELECT id, score FROM score_duplicate ORDER BY id")).all() == [(2, 5), (4, 0)]
+        # Emptied, to be rebuilt without the moved attempts
+        assert connection.execute(text("SELECT COUNT(*) FROM subject_stats")).scalar() == 0
+
+
+def test_no_duplicates_leaves_the_rollups():
+    engine = database([{'id': 1, 'user_id': 1, 'quiz_id': 1, 'score': 2}, {'id': 2, 'user_id': 2, 'quiz_id': 1, 'score': 1}])
+    with engine.begin() as connection:
+        assert migrations.add_lookup_indexes(connection) is None
+        assert connection.execute(text("SELECT COUNT(*) FROM score")).scalar() == 2
+        assert connection.execute(text("SELECT COUNT(*) FROM subject_stats")).scalar() == 1
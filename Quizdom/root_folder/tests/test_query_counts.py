@@ -0,0 +1,93 @@
+# SQL statements per page must not grow with the number of subjects, quizzes, questions or attempts on it.
+# A relationship that falls back to lazy loading in a template (N+1 queries) fails these tests.
+# Usage (from the folder containing main.py): python -m pytest -q tests
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+
+PASSWORD = 'counted'
+# Large enough that every seeded row is on the first page
+PAGE = 'per_page=100'
+
+
+def seed(main, subjects, quizzes_per_chapter, questions, user_id=None):
+    db = main.db
+    for subject_number in range(subjects):
+        subject = main.Subject(name=f'Subject {subject_number}', description='Counted subject')
+        db.session.add(subject)
+        for chapter_number in range(2):
+            chapter = main.Chapter(title=f'Chapter {chapter_number}', description='Counted chapter', subject=subject)
+            db.session.add(chapter)
+            for quiz_number in range(quizzes_per_chapter):
+                quiz = main.Quiz(title=f'Quiz {quiz_number}', chapter=chapter, date_of_quiz=datetime(2025, 1, 1),
+                                 time_duration=30, remarks='', question_count=questions)
+                db.session.add(quiz)
+                for question_number in range(questions):
+                    db.session.add(main.Question(quiz=quiz, question_text=f'Question {question_number}', option1='a',
+                                                 option2='b', option3='c', option4='d', correct_option=1))
+                if user_id is not None:
+                    db.session.add(main.Score(user_id=user_id, quiz=quiz, score=1, date_taken=datetime(2025, 2, 1),
+                                              time_taken=60, completed=True))
+    db.session.flush()
+    main.rebuild_rollups()
+    db.session.commit()
+
+
+def login(main, path, username):
+    client = main.app.test_client()
+    response = client.post(path, data={'username_or_email': username, 'password': PASSWORD if username != 'admin' else 'admin123'})
+    assert response.status_code == 302
+    return client
+
+
+# Signed-in admin and user clients over a small bank in which the user has attempted every quiz
+@pytest.fixture(scope='module')
+def clients(main):
+    user = main.User(username='counted', email='counted@example.com', fullname='Counted User',
+                     qualification='Test', dob=datetime(2000, 1, 1).date())
+    user.set_password(PASSWORD)
+    main.db.session.add(user)
+    main.db.session.commit()
+    seed(main, subjects=1, quizzes_per_chapter=1, questions=1, user_id=user.id)
+    return {'admin': login(main, '/Admin-Login', 'admin'), 'user': login(main, '/User-Login', 'counted'), 'user_id': user.id}
+
+
+def statements(main, client, path):
+    # Cached cards would hide the queries that render them
+    main.fragment_cache = main.QuizCache(main.app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+    executed = []
+
+    def count(*arguments):
+        executed.append(arguments[2])
+
+    event.listen(main.db.engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(f"{path}{'&' if '?' in path else '?'}{PAGE}")
+    finally:
+        event.remove(main.db.engine, 'before_cursor_execute', count)
+    assert response.status_code == 200, path
+    return executed
+
+
+# (client, page, most statements it may run)
+PAGES = [
+    ('admin', '/Manage-Quizzes', 3),
+    ('admin', '/Manage-Subjects', 2),
+    ('user', '/Upcomming-Quizzes', 2),
+    ('user', '/Scorecard', 1),
+    ('user', '/Scorecard?history=all', 1)
+]
+
+
+@pytest.mark.parametrize('who, path, limit', PAGES)
+def test_statement_count_per_page(main, clients, who, path, limit):
+    executed = statements(main, clients[who], path)
+    assert len(executed) <= limit, executed
+
+
+def test_statement_count_does_not_grow_with_rows(main, clients):
+    small = {path: statements(main, clients[who], path) for who, path, _ in PAGES}
+    seed(main, subjects=5, quizzes_per_chapter=4, questions=6, user_id=clients['user_id'])
+    large = {path: statements(main, clients[who], path) for who, path, _ in PAGES}
+    for _, path, _ in PAGES:
+        assert len(large[path]) == len(small[path]), (path, small[path], large[path])
@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import question_io
+
+ROW = {'subject': 'Maths', 'chapter': 'Algebra', 'quiz': 'Quiz 1', 'question_text': 'Question', 'option1': 'a',
+       'option2': 'b', 'option3': 'c', 'option4': 'd', 'correct_option': '2'}
+
+
+def test_validate_row_reads_time_duration():
+    assert question_io.validate_row(1, dict(ROW, quiz_time_duration='45'))['quiz_time_duration'] == 45
+    assert question_io.validate_row(1, ROW)['quiz_time_duration'] == question_io.DEFAULT_TIME_DURATION
+
+
+@pytest.mark.parametrize('duration', ['²', '٣٠', '１０', '-5', '1.5', 'ten'])
+def test_validate_row_rejects_invalid_time_duration(duration):
+    with pytest.raises(question_io.RowError):
+        question_io.validate_row(3, dict(ROW, quiz_time_duration=duration))
@@ -0,0 +1,53 @@
+# The summary rollups must follow every change that moves an attempt's percentage
+import io
+from datetime import datetime
+import pytest
+
+
+@pytest.fixture
+def scored_quiz(main, request):
+    db = main.db
+    # Names are unique per test, the database is shared
+    name = request.function.__name__
+    user = main.User(username=name, email=f'{name}@example.com', fullname='Rolled User', qualification='Test',
+                     dob=datetime(2000, 1, 1).date())
+    user.set_password('rolled')
+    subject = main.Subject(name=name, description='')
+    chapter = main.Chapter(title=name, description='', subject=subject)
+    quiz = main.Quiz(title=name, chapter=chapter, date_of_quiz=datetime(2025, 1, 1), time_duration=30,
+                     remarks='', question_count=2)
+    db.session.add_all([user, subject, chapter, quiz])
+    for number in range(2):
+        db.session.add(main.Question(quiz=quiz, question_text=f'Question {number}', option1='a', option2='b',
+                                     option3='c', option4='d', correct_option=1))
+    db.session.add(main.Score(user=user, quiz=quiz, score=2, date_taken=datetime(2025, 2, 1), time_taken=60, completed=True))
+    db.session.flush()
+    main.rebuild_rollups([subject.id])
+    db.session.commit()
+    admin = main.app.test_client()
+    assert admin.post('/Admin-Login', data={'username_or_email': 'admin', 'password': 'admin123'}).status_code == 302
+    return admin, subject.id, user.id, quiz.id
+
+
+def max_percentages(main, subject_id, user_id):
+    main.db.session.expire_all()
+    return (main.db.session.get(main.SubjectStats, subject_id).max_percentage,
+            main.db.session.get(main.UserSubjectStats, (user_id, subject_id)).max_percentage)
+
+
+def test_new_question_updates_rollups(main, scored_quiz):
+    admin, subject_id, user_id, quiz_id = scored_quiz
+    assert max_percentages(main, subject_id, user_id) == (100, 100)
+    for number in range(2):
+        admin.post(f'/New-Question/{quiz_id}', data={'question_text': f'Added {number}', 'option1': 'a', 'option2': 'b',
+                                                     'option3': 'c', 'option4': 'd', 'correct_option': '1'})
+    assert max_percentages(main, subject_id, user_id) == (50, 50)
+
+
+def test_import_updates_rollups(main, scored_quiz):
+    admin, subject_id, user_id, quiz_id = scored_quiz
+    name = 'test_import_updates_rollups'
+    rows = ''.join(f'{name},{name},{name},Imported {number},a,b,c,d,1\n' for number in range(2))
+    upload = io.BytesIO(('subject,chapter,quiz,question_text,option1,option2,option3,option4,correct_option\n' + rows).encode())
+    admin.post('/Import-Questions', data={'file': (upload, 'questions.csv')}, content_type='multipart/form-data')
+    assert max_percentages(main, subject_id, user_id) == (50, 50)
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.fixture(scope='module')
+def client(main):
+    client = main.app.test_client()
+    client.post('/User-Registration', data={'username': 'scored', 'email': 'scored@example.com', 'fullname': 'Scored User',
+                                            'qualification': 'Test', 'dob': '2000-01-01', 'password': 'scored'})
+    response = client.post('/User-Login', data={'username_or_email': 'scored', 'password': 'scored'})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.mark.parametrize('search', ['50%', '²%', '٣%', '%', 'abc%', '100'])
+def test_scorecard_search(client, search):
+    for history in ('', 'all'):
+        assert client.get('/Scorecard', query_string={'search': search, 'history': history}).status_code == 200